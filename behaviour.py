@@ -1,18 +1,271 @@
-from component import Component
+import time
+import traceback
+
+from panity.component import Component
+from messagestats import Histogram
+
+
+class BehaviourScheduler(object):
+    """Calls the hooks of all active Behaviours. Every Behaviour is added
+    when it's created and removed when it's destroyed.
+
+    awake() and start() of new behaviours are called once, at the beginning
+    of the next frame. After that update() and lateUpdate() are called every
+    frame. Behaviours with a lower execution_order come first in each phase,
+    behaviours with the same one in the order they were added. Hooks a
+    class doesn't override are never called.
+
+    fixedUpdate() is called every fixed_timestep seconds of game time,
+    independent of the frame rate, before update(). That may be zero or
+    several times per frame. If the frames get so long that more than
+    max_fixed_steps would be needed, the rest of the time is dropped and
+    the simulation falls behind instead of taking ever longer frames. alpha
+    tells how far the frame is between the last and the next fixed step,
+    to interpolate what's rendered.
+
+    attach() drives the scheduler from Panda3D's task manager. Without
+    Panda3D, call frame() instead.
+    """
+    # hooks run in every frame, in this order. fixedUpdate may run several
+    # times or not at all.
+    PHASES = ("fixedUpdate", "update", "lateUpdate")
+
+    def __init__(self, fixed_timestep=0.02, max_fixed_steps=5):
+        if fixed_timestep <= 0:
+            raise ValueError("fixed_timestep must be positive, got "
+                             "{}".format(fixed_timestep))
+        if max_fixed_steps <= 0:
+            raise ValueError("max_fixed_steps must be positive, got "
+                             "{}".format(max_fixed_steps))
+        # behaviours whose awake() and start() haven't been called yet
+        self._pending = []
+        # phase -> {execution order: [bound hook]}
+        self._buckets = dict((phase, {}) for phase in self.PHASES)
+        # phase -> the lists of _buckets, sorted by execution order
+        self._sequences = dict((phase, []) for phase in self.PHASES)
+        # destroyed behaviours, taken out of the buckets before the next
+        # phase
+        self._removed = set()
+        # class -> names of the hooks it overrides
+        self._hooks = {}
+        # phase name -> Histogram of the time per frame
+        self.stats = {}
+        self.frame_count = 0
+        # seconds since the last frame
+        self.delta_time = 0.0
+        self.fixed_timestep = fixed_timestep
+        self.max_fixed_steps = max_fixed_steps
+        # game time not simulated by fixed steps yet
+        self._accumulator = 0.0
+        # accumulated time / fixed_timestep after the last step, 0 <= alpha < 1
+        self.alpha = 0.0
+        self.fixed_step_count = 0
+        # frames in which fixed steps were limited by max_fixed_steps, and
+        # the seconds dropped in them
+        self.throttle_count = 0
+        self.dropped_time = 0.0
+
+    def add(self, behaviour):
+        """Schedule a behaviour. Called by Behaviour.__init__."""
+        self._pending.append(behaviour)
+
+    def remove(self, behaviour):
+        """Stop calling the hooks of a behaviour. Called by
+        Behaviour.destroy. Hooks of the current phase may still be called.
+        """
+        if behaviour in self._pending:
+            self._pending.remove(behaviour)
+        else:
+            self._removed.add(behaviour)
+
+    def getHooks(self, cls):
+        """Return the names of the hooks cls overrides."""
+        hooks = self._hooks.get(cls)
+        if hooks is None:
+            hooks = self._hooks[cls] = tuple(
+                name for name in ("awake", "start") + self.PHASES
+                if getattr(cls, name) != getattr(Behaviour, name))
+        return hooks
+
+    def frame(self, delta_time):
+        """Run all phases of one frame."""
+        self.step(delta_time)
+        self.runUpdate(delta_time)
+        self.runLateUpdate()
+
+    def step(self, delta_time):
+        """Advance game time by delta_time seconds and run as many fixed
+        steps as fit, at most max_fixed_steps. Returns the number of steps.
+        """
+        if self._pending:
+            self._startPending()
+        timestep = self.fixed_timestep
+        self._accumulator += delta_time
+        steps = 0
+        while self._accumulator >= timestep:
+            if steps == self.max_fixed_steps:
+                # Catching up would take even longer, drop the rest.
+                dropped = self._accumulator - self._accumulator % timestep
+                self._accumulator -= dropped
+                self.dropped_time += dropped
+                self.throttle_count += 1
+                break
+            self._runPhase("fixedUpdate")
+            self._accumulator -= timestep
+            steps += 1
+        self.fixed_step_count += steps
+        self.alpha = self._accumulator / timestep
+        return steps
+
+    def runUpdate(self, delta_time):
+        """Start a frame: awake and start new behaviours, then update all."""
+        self.frame_count += 1
+        self.delta_time = delta_time
+        if self._pending:
+            self._startPending()
+        self._runPhase("update")
+
+    def runLateUpdate(self):
+        self._runPhase("lateUpdate")
+
+    def attach(self, task_manager, clock=None, fixed_sort=10, sort=15,
+               late_sort=40):
+        """Run fixed steps, update and lateUpdate from tasks of a Panda3D
+        task manager, e.g. base.taskMgr. clock defaults to the global clock.
+
+        The default sort values don't collide with the tasks of ShowBase:
+        input (dataLoop, -50) and events (eventManager, 0) come first, then
+        fixed steps (10) and update (15). After update the intervals
+        (ivalLoop, 20) and collisions (collisionLoop, 30) run, then
+        lateUpdate (40), and finally rendering (igLoop, 50).
+        """
+        if clock is None:
+            from panda3d.core import ClockObject
+            clock = ClockObject.getGlobalClock()
+        def fixedUpdateTask(task):
+            self.step(clock.getDt())
+            return task.cont
+        def updateTask(task):
+            self.runUpdate(clock.getDt())
+            return task.cont
+        def lateUpdateTask(task):
+            self.runLateUpdate()
+            return task.cont
+        task_manager.add(fixedUpdateTask, "behaviour fixed update",
+                         sort=fixed_sort)
+        task_manager.add(updateTask, "behaviour update", sort=sort)
+        task_manager.add(lateUpdateTask, "behaviour late update",
+                         sort=late_sort)
+
+    def dumpStats(self):
+        """Return the time spent in each phase as text table."""
+        lines = ["behaviour phases of {} frames, {} fixed steps, {} "
+                 "throttled frames ({:.3f} s dropped)".format(
+                 self.frame_count, self.fixed_step_count,
+                 self.throttle_count, self.dropped_time),
+                 "{:<20} {:>10} {:>10} {:>10} {:>10}".format(
+                 "duration (ms)", "count", "mean", "p99", "max")]
+        for phase in ("awake", "start") + self.PHASES:
+            h = self.stats.get(phase)
+            if h is None:
+                continue
+            lines.append("{:<20} {:>10} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                phase, h.count, h.mean * 1e3, h.percentile(99) * 1e3,
+                h.maximum * 1e3))
+        return "\n".join(lines)
+
+    def _startPending(self):
+        pending = self._pending
+        self._pending = []
+        pending.sort(key=lambda b: b.execution_order)
+        self._callAll("awake", [b.awake for b in pending
+                                if "awake" in self.getHooks(type(b))])
+        # some may have been destroyed in the meantime
+        pending = [b for b in pending if b not in self._removed]
+        self._callAll("start", [b.start for b in pending
+                                if "start" in self.getHooks(type(b))])
+        pending = [b for b in pending if b not in self._removed]
+        for behaviour in pending:
+            hooks = self.getHooks(type(behaviour))
+            order = behaviour.execution_order
+            for phase in self.PHASES:
+                if phase not in hooks:
+                    continue
+                buckets = self._buckets[phase]
+                bucket = buckets.get(order)
+                if bucket is None:
+                    bucket = buckets[order] = []
+                    self._sequences[phase] = [buckets[o] for o in
+                                              sorted(buckets)]
+                bucket.append(getattr(behaviour, phase))
+
+    def _purge(self):
+        removed = self._removed
+        for buckets in self._buckets.values():
+            for bucket in buckets.values():
+                bucket[:] = [f for f in bucket if f.__self__ not in removed]
+        removed.clear()
+
+    def _runPhase(self, phase):
+        if self._removed:
+            self._purge()
+        start = time.time()
+        for bucket in self._sequences[phase]:
+            for f in bucket:
+                try:
+                    f()
+                except Exception:
+                    traceback.print_exc()
+        self._record(phase, time.time() - start)
+
+    def _callAll(self, phase, functions):
+        if not functions:
+            return
+        start = time.time()
+        for f in functions:
+            try:
+                f()
+            except Exception:
+                traceback.print_exc()
+        self._record(phase, time.time() - start)
+
+    def _record(self, phase, seconds):
+        histogram = self.stats.get(phase)
+        if histogram is None:
+            histogram = self.stats[phase] = Histogram()
+        histogram.add(seconds)
+
+scheduler = BehaviourScheduler()
+
 
 class Behaviour(Component):
+    """Base class of scripts. Override the hooks you need, the others are
+    never called. See BehaviourScheduler for when they run.
+    """
+    # Behaviours with a lower execution order run first in each phase.
+    execution_order = 0
+
+    def __init__(self, game_object):
+        Component.__init__(self, game_object)
+        scheduler.add(self)
+
+    def destroy(self):
+        """Call this when overriding destroy, otherwise the hooks keep
+        running.
+        """
+        scheduler.remove(self)
 
     def update(self):
         pass
-    
+
     def lateUpdate(self):
         pass
-    
+
     def fixedUpdate(self):
         pass
-    
+
     def awake(self):
         pass
-    
+
     def start(self):
         pass
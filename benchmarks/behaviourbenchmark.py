@@ -0,0 +1,67 @@
+"""Measure one frame of 50k behaviours. One in ten overrides update, one in
+fifty lateUpdate, the rest only have the inherited no-op hooks. The naive
+loop calls update and lateUpdate of every behaviour, like a loop over all
+components would.
+"""
+import time
+
+from panity.behaviour import Behaviour, scheduler
+
+N = 50000
+FRAMES = 20
+
+
+class FakeGameObject(object):
+    """Just enough of a GameObject for components."""
+    def __init__(self):
+        self.components = {}
+
+
+class Mover(Behaviour):
+    def update(self):
+        self.x = 1
+
+class Follower(Behaviour):
+    def lateUpdate(self):
+        self.y = 1
+
+class Idle(Behaviour):
+    pass
+
+
+def naiveFrame(behaviours):
+    for behaviour in behaviours:
+        behaviour.update()
+    for behaviour in behaviours:
+        behaviour.lateUpdate()
+
+
+def measure(function):
+    """Return milliseconds per frame."""
+    start = time.time()
+    for _ in range(FRAMES):
+        function()
+    return (time.time() - start) / FRAMES * 1e3
+
+
+behaviours = []
+for i in range(N):
+    if i % 10 == 0:
+        cls = Mover
+    elif i % 50 == 1:
+        cls = Follower
+    else:
+        cls = Idle
+    behaviours.append(cls(FakeGameObject()))
+# awake and start
+scheduler.frame(0.0)
+
+naive = measure(lambda: naiveFrame(behaviours))
+scheduled = measure(lambda: scheduler.frame(0.016))
+print "%d behaviours" % N
+print "%-16s %12s %12s %8s" % ("ms per frame", "naive", "scheduler",
+                               "speedup")
+print "%-16s %12.2f %12.2f %7.1fx" % ("frame", naive, scheduled,
+                                      naive / scheduled)
+print
+print scheduler.dumpStats()
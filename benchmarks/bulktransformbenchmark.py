@@ -0,0 +1,67 @@
+"""Compare moving 10k game objects one by one through
+Transform.local_position with Transform.setLocalPositions, and reading their
+positions back. Each transform has a listener, like a component that follows
+its game object.
+
+Requires Panda3D and numpy.
+"""
+import time
+
+import numpy
+
+from panity.components.transform import Transform
+from panity.gameobject import GameObject
+
+N = 10000
+FRAMES = 10
+
+
+class Follower(object):
+    def __init__(self):
+        self.calls = 0
+
+    def moved(self, position):
+        self.calls += 1
+
+
+def setEach(transforms, positions):
+    for transform, position in zip(transforms, positions):
+        transform.local_position = position
+
+def getEach(transforms):
+    return numpy.array([tuple(t.local_position) for t in transforms])
+
+
+def measure(function, *args):
+    """Return milliseconds per call."""
+    start = time.time()
+    for _ in range(FRAMES):
+        function(*args)
+    return (time.time() - start) / FRAMES * 1e3
+
+
+root = GameObject("root")
+transforms = []
+follower = Follower()
+for i in range(N):
+    game_object = GameObject("object %d" % i)
+    game_object.transform.parent = root.transform
+    Transform.local_position.addListener(game_object.transform,
+                                         follower.moved)
+    transforms.append(game_object.transform)
+positions = numpy.random.random((N, 3))
+
+print "%d game objects" % N
+print "%-20s %12s %12s %8s" % ("ms per frame", "one by one", "bulk",
+                               "speedup")
+for name, each, bulk in [
+        ("set positions",
+         lambda: setEach(transforms, positions.tolist()),
+         lambda: Transform.setLocalPositions(transforms, positions)),
+        ("get positions",
+         lambda: getEach(transforms),
+         lambda: Transform.getLocalPositions(transforms))]:
+    each_time = measure(each)
+    bulk_time = measure(bulk)
+    print "%-20s %12.2f %12.2f %7.1fx" % (name, each_time, bulk_time,
+                                          each_time / bulk_time)
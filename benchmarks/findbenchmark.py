@@ -0,0 +1,80 @@
+"""Compare Object.findObjectsOfType and findObjectOfType with a traversal of
+the whole scene graph, on a scene of 100k game objects. Every tenth game
+object has a Mesh, a single one deep down in the hierarchy has a Marker.
+
+Requires Panda3D.
+"""
+import time
+
+from panity.component import Component
+from panity.components.mesh import Mesh
+from panity.gameobject import GameObject
+from panity.object import Object
+
+N = 100000
+FANOUT = 10
+
+
+class Marker(Component):
+    pass
+
+
+def buildScene():
+    root = GameObject("root")
+    parents = [root]
+    for i in xrange(N - 1):
+        game_object = GameObject("object %d" % i)
+        game_object.transform.parent = parents[i // FANOUT].transform
+        if i % 10 == 0:
+            game_object.addComponent(Mesh)
+        parents.append(game_object)
+    parents[-1].addComponent(Marker)
+    return root
+
+
+def traverseAll(game_object, typ, found):
+    for component in game_object.components.values():
+        if isinstance(component, typ):
+            found.append(component)
+    for child in game_object:
+        traverseAll(child, typ, found)
+    return found
+
+def traverseFirst(game_object, typ):
+    for component in game_object.components.values():
+        if isinstance(component, typ):
+            return component
+    for child in game_object:
+        component = traverseFirst(child, typ)
+        if component is not None:
+            return component
+
+
+def best(function, repeat=3):
+    """Return the best of some runs in seconds."""
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        function()
+        seconds = time.time() - start
+        result = seconds if result is None else min(result, seconds)
+    return result
+
+
+root = buildScene()
+assert len(traverseAll(root, Mesh, [])) == len(Object.findObjectsOfType(Mesh))
+
+print "milliseconds per call on %d game objects" % N
+print "%-28s %12s %12s %8s" % ("", "traversal", "index", "speedup")
+for name, traversal, index in [
+        ("findObjectsOfType(Mesh)",
+         lambda: traverseAll(root, Mesh, []),
+         lambda: Object.findObjectsOfType(Mesh)),
+        ("findObjectOfType(Marker)",
+         lambda: traverseFirst(root, Marker),
+         lambda: Object.findObjectOfType(Marker))]:
+    traversal_time = best(traversal)
+    index_time = max(best(index), 1e-9)
+    print "%-28s %12.3f %12.3f %7.0fx" % (name, traversal_time * 1e3,
+                                          index_time * 1e3,
+                                          traversal_time / index_time)
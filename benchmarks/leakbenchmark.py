@@ -0,0 +1,50 @@
+"""Create and destroy many game objects and report the memory use of the
+process. Every game object gets a Mesh, which listens to its own path
+property. Once the first round has warmed up the allocator, RSS should stay
+flat; if it keeps growing, destroyed objects are leaking.
+
+Requires Panda3D.
+"""
+import gc
+import os
+import resource
+import time
+
+from panity.gameobject import GameObject
+
+N = 100000
+REPORTS = 10
+
+
+def getRSS():
+    """Return the resident set size of this process in MiB. Uses /proc
+    where available, the peak RSS otherwise.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024.0 ** 2
+    except (IOError, OSError):
+        # kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def createAndDestroy(count):
+    for i in xrange(count):
+        game_object = GameObject("object %d" % i, ["Mesh"])
+        game_object.destroy()
+
+
+def countAlive():
+    gc.collect()
+    return sum(1 for o in gc.get_objects() if isinstance(o, GameObject))
+
+
+print "%10s %10s %10s %10s" % ("objects", "RSS (MiB)", "alive", "seconds")
+print "%10d %10.1f %10d %10s" % (0, getRSS(), countAlive(), "")
+for report in range(1, REPORTS + 1):
+    start = time.time()
+    createAndDestroy(N // REPORTS)
+    seconds = time.time() - start
+    print "%10d %10.1f %10d %10.2f" % (report * N // REPORTS, getRSS(),
+                                       countAlive(), seconds)
@@ -0,0 +1,41 @@
+"""Compare the binary payload encoding of messagecenter with plain pickling,
+the way payloads were sent before. Prints encode and decode throughput and
+the size of one encoded payload for each request class.
+"""
+import timeit
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from panity.messagecenter import *
+
+PAYLOADS = [
+    AddGameObjectRequest(12345),
+    RemoveGameObjectRequest(12345),
+    OpenWindowRequest(1, 0x3a0004e, 800, 600),
+    CloseWindowRequest(1),
+    ResizeWindowRequest(1, 800, 600),
+    FocusWindowRequest(1),
+]
+N = 100000
+
+
+def pickled(payload):
+    return pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+
+def throughput(function, argument):
+    seconds = min(timeit.repeat(lambda: function(argument), number=N,
+                                repeat=3))
+    return N / seconds
+
+
+print "{:<24} {:>12} {:>12} {:>6}".format("", "encode/s", "decode/s", "bytes")
+for payload in PAYLOADS:
+    name = type(payload).__name__
+    for label, encode, decode in (("pickle", pickled, pickle.loads),
+                                  ("binary", encodePayload, decodePayload)):
+        data = encode(payload)
+        print "{:<24} {:>12.0f} {:>12.0f} {:>6}".format(
+            name + " " + label, throughput(encode, payload),
+            throughput(decode, data), len(data))
@@ -0,0 +1,86 @@
+"""Compare GameObject.find and findWithName with a recursive search through
+GameObject.__iter__, on a hierarchy of 100k game objects with ten children
+per game object.
+
+Requires Panda3D.
+"""
+import time
+
+from panity.gameobject import GameObject
+
+N = 100000
+FANOUT = 10
+
+
+def buildScene():
+    """Return the root and the game object created last, which is one of the
+    deepest.
+    """
+    root = GameObject("root")
+    parents = [root]
+    for i in xrange(N - 1):
+        game_object = GameObject("object %d" % i)
+        game_object.transform.parent = parents[i // FANOUT].transform
+        parents.append(game_object)
+    return root, parents[-1]
+
+
+def getPath(game_object):
+    names = []
+    transform = game_object.transform
+    while transform.parent is not transform:
+        names.append(transform.name)
+        transform = transform.parent
+    names.append(transform.name)
+    return "/" + "/".join(reversed(names))
+
+
+def searchPath(game_object, names):
+    if game_object.name != names[0]:
+        return None
+    if len(names) == 1:
+        return game_object
+    for child in game_object:
+        found = searchPath(child, names[1:])
+        if found is not None:
+            return found
+
+def searchName(game_object, name, found):
+    if game_object.name == name:
+        found.append(game_object)
+    for child in game_object:
+        searchName(child, name, found)
+    return found
+
+
+def best(function, repeat=3):
+    """Return the best of some runs in seconds."""
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        function()
+        seconds = time.time() - start
+        result = seconds if result is None else min(result, seconds)
+    return result
+
+
+root, deepest = buildScene()
+path = getPath(deepest)
+names = path.split("/")[1:]
+assert searchPath(root, names) is deepest
+assert GameObject.find(path) is deepest
+
+print "milliseconds per call on %d game objects" % N
+print "%-24s %12s %12s %8s" % ("", "traversal", "index", "speedup")
+for name, traversal, index in [
+        ("find(path)",
+         lambda: searchPath(root, names),
+         lambda: GameObject.find(path)),
+        ("findWithName(name)",
+         lambda: searchName(root, deepest.name, []),
+         lambda: GameObject.findWithName(deepest.name))]:
+    traversal_time = best(traversal)
+    index_time = max(best(index), 1e-9)
+    print "%-24s %12.3f %12.3f %7.0fx" % (name, traversal_time * 1e3,
+                                          index_time * 1e3,
+                                          traversal_time / index_time)
@@ -0,0 +1,122 @@
+"""Measure get and set throughput of FloatProperty. The legacy property
+stores values like SerializedProperty did before the slot layout: in a
+_properties dict on the object, keyed by the descriptor, with hasattr and
+has_key checks on every access. It validates with assert, converting after
+a failed check, and doesn't record changes in the journal.
+"""
+import time
+
+from panity.properties import *
+
+N = 200000
+
+
+class LegacyFloatProperty(FloatProperty):
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        if hasattr(obj, "_properties") and obj._properties.has_key(self):
+            return obj._properties[self]
+        else:
+            return self.default
+
+    def __set__(self, obj, value):
+        if not hasattr(obj, "_properties"):
+            obj._properties = {}
+            if value == self.default:
+                return value
+        elif obj._properties.has_key(self) and value == obj._properties[self]:
+                return value
+        try:
+            self.check(value)
+            obj._properties[self] = value
+            self._invokeListeners(obj, value)
+            return value
+        except AssertionError:
+            pass
+        try:
+            value = self.convert(value)
+            self.check(value)
+            obj._properties[self] = value
+            self._invokeListeners(obj, value)
+            return value
+        except (AssertionError, ValueError) as e:
+            return False
+
+    def check(self, value):
+        assert isinstance(value, float)
+        if self.minimum is not None:
+            assert value >= self.minimum
+        if self.maximum is not None:
+            assert value <= self.maximum
+
+    def convert(self, value):
+        value = float(value)
+        if value < self.minimum:
+            return self.minimum
+        elif self.maximum is not None and value > self.maximum:
+            return self.maximum
+        return value
+
+    def _invokeListeners(self, obj, value):
+        if hasattr(obj, "_listeners") and self in obj._listeners:
+            for f in obj._listeners[self]:
+                f(value)
+
+
+def makeComponent(property_class, count=20):
+    """Return an instance of a new class with count properties."""
+    attributes = dict(("p%d" % i, property_class()) for i in range(count))
+    return type("Component", (object,), attributes)()
+
+
+def best(function):
+    """Return the best of three runs in seconds per operation."""
+    result = None
+    for _ in range(3):
+        start = time.time()
+        function()
+        seconds = (time.time() - start) / N
+        result = seconds if result is None else min(result, seconds)
+    return result
+
+
+def getUnset(c):
+    for _ in xrange(N):
+        c.p10
+
+def getSet(c):
+    for _ in xrange(N):
+        c.p5
+
+def setChanged(c):
+    value = 1.0
+    for _ in xrange(N):
+        value = -value
+        c.p5 = value
+
+def setConverted(c):
+    value = 1
+    for _ in xrange(N):
+        value = -value
+        c.p5 = value
+
+def setUnchanged(c):
+    for _ in xrange(N):
+        c.p5 = 2.0
+
+
+print "operations per second"
+print "%-16s %12s %12s %8s" % ("", "legacy", "slots", "speedup")
+for name, function in [("get default", getUnset), ("get", getSet),
+                       ("set", setChanged), ("set converted", setConverted),
+                       ("set unchanged", setUnchanged)]:
+    legacy = makeComponent(LegacyFloatProperty)
+    slots = makeComponent(FloatProperty)
+    for c in (legacy, slots):
+        c.p5 = 2.0
+    legacy_time = best(lambda: function(legacy))
+    slots_time = best(lambda: function(slots))
+    print "%-16s %12.0f %12.0f %7.1fx" % (name, 1 / legacy_time,
+                                          1 / slots_time,
+                                          legacy_time / slots_time)
@@ -0,0 +1,72 @@
+"""Measure how long MessageServer needs to route one message depending on
+the number of connected clients. The legacy server routes like the server
+did before the routing table: membership tests on lists of names and a copy
+of the pipes dict for every OTHERS message.
+"""
+import time
+
+from panity.messagecenter import *
+
+N = 5000
+
+
+class LegacyRoutingServer(MessageServer):
+    def _route(self, name, message):
+        recievers = message.recievers
+        if isinstance(recievers, int):
+            if recievers == ALL:
+                targets = list(self.pipes.keys())
+            else:
+                others = dict(self.pipes)
+                del others[name]
+                targets = list(others.keys())
+        elif isinstance(recievers, basestring):
+            assert recievers in list(self.pipes.keys())
+            targets = [recievers]
+        else:
+            targets = []
+            for rec in recievers:
+                assert rec in list(self.pipes.keys())
+                targets.append(rec)
+        for target in targets:
+            outbox = self._outboxes[target]
+            if not outbox:
+                self._pending.append(outbox)
+            outbox.append(message)
+
+
+def routingTime(server_class, endpoints, recievers):
+    """Return seconds per message for routing N messages from client 0.
+    Only routing is measured. The outboxes are emptied without sending.
+    """
+    server = server_class()
+    for i in range(endpoints):
+        server_end, client_end = FakePipe()
+        server.connectPipe("client %d" % i, server_end)
+    message = Message(recievers, FocusWindowRequest(1))
+    best = None
+    for _ in range(3):
+        start = time.time()
+        for _ in range(N):
+            server._route("client 0", message)
+            for outbox in server._pending:
+                outbox.take()
+            server._pending = []
+        seconds = (time.time() - start) / N
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+print "microseconds per routed message"
+print "{:>9} {:>18} {:>18} {:>18}".format(
+    "endpoints", "unicast", "others", "multicast (2)")
+print "{:>9} {:>18} {:>18} {:>18}".format(
+    "", "legacy / table", "legacy / table", "legacy / table")
+for endpoints in (2, 5, 10, 20, 50, 100, 200):
+    row = []
+    for recievers in ("client 1", OTHERS, ["client 1", "client %d" % (
+                                                            endpoints - 1)]):
+        legacy = routingTime(LegacyRoutingServer, endpoints, recievers)
+        table = routingTime(MessageServer, endpoints, recievers)
+        row.append("{:>8.2f} / {:<7.2f}".format(legacy * 1e6, table * 1e6))
+    print "{:>9} {} {} {}".format(endpoints, *row)
@@ -0,0 +1,70 @@
+"""Measure one frame of reading the world positions of all game objects in
+a deep hierarchy, with a few of them moved each frame. The legacy functions
+compute world positions like Transform did before caching: walk up through
+parent to find the root, then ask Panda3D for the position relative to it.
+
+Requires Panda3D.
+"""
+import random
+import time
+
+from panity.gameobject import GameObject
+
+CHAINS = 100
+DEPTH = 100
+MOVED = 50
+FRAMES = 20
+
+
+def legacyRoot(transform):
+    while transform.parent is not transform:
+        transform = transform.parent
+    return transform
+
+def legacyPosition(transform):
+    return transform.node.getPos(legacyRoot(transform).node)
+
+
+def buildScene():
+    """Return a list of all transforms: one root with CHAINS chains of
+    DEPTH game objects each.
+    """
+    root = GameObject("root")
+    transforms = [root.transform]
+    for c in range(CHAINS):
+        parent = root.transform
+        for d in range(DEPTH):
+            game_object = GameObject("chain %d depth %d" % (c, d))
+            game_object.transform.parent = parent
+            game_object.transform.local_position = (0, 1, 0)
+            parent = game_object.transform
+            transforms.append(parent)
+    return transforms
+
+
+def frame(transforms, moved, read):
+    for transform in moved:
+        transform.local_position = (random.random(), 1, 0)
+    for transform in transforms:
+        read(transform)
+
+
+def measure(transforms, read):
+    """Return milliseconds per frame."""
+    random.seed(0)
+    start = time.time()
+    for _ in range(FRAMES):
+        frame(transforms, random.sample(transforms[1:], MOVED), read)
+    return (time.time() - start) / FRAMES * 1e3
+
+
+transforms = buildScene()
+for transform in random.sample(transforms, 100):
+    assert transform.position == legacyPosition(transform)
+
+print "%d game objects, %d moved per frame" % (len(transforms), MOVED)
+print "%-16s %12s %12s %8s" % ("ms per frame", "legacy", "cached", "speedup")
+legacy = measure(transforms, legacyPosition)
+cached = measure(transforms, lambda transform: transform.position)
+print "%-16s %12.2f %12.2f %7.1fx" % ("position", legacy, cached,
+                                      legacy / cached)
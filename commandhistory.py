@@ -1,3 +1,6 @@
+from panity.properties import batch
+
+
 class Step(object):
 	"""Interface to the objects expected in CommandHistory."""
 	def undo(self):
@@ -17,7 +20,8 @@ class CommandHistory(object):
 		except IndexError:
 			pass
 		else:
-			step.undo()
+			with batch():
+				step.undo()
 			self.redoable.append(step)
 
 	def redo(self):
@@ -26,7 +30,8 @@ class CommandHistory(object):
 		except IndexError:
 			pass
 		else:
-			step.do()
+			with batch():
+				step.do()
 
 	def addStep(self, step):
 		"""Add a step that has been just performed.
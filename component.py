@@ -1,10 +1,40 @@
-from object import Object
-from properties import SerializedProperty
+import collections
+
+from panity.object import Object
+from panity.properties import SerializedProperty, initPropertyValues
+from panity import util
+
+# Serialization metadata of one property of a component class.
+# name -- attribute name
+# tag -- xml tag
+# property -- the SerializedProperty (or decorator)
+# toXML, fromXML -- converters of the property
+PropertyInfo = collections.namedtuple("PropertyInfo",
+                                      "name tag property toXML fromXML")
+
+
+class ComponentMeta(type):
+    """Metaclass of Component. Collects the serialized properties of every
+    component class once, when the class is created, so that serializing
+    doesn't need to look at the class attributes for every instance.
+    """
+    def __init__(cls, name, bases, attributes):
+        super(ComponentMeta, cls).__init__(name, bases, attributes)
+        cls._xml_tag = util.camelToSnake(name)
+        info = tuple(PropertyInfo(n, util.camelToSnake(n), p, p.toXML,
+                                  p.fromXML)
+                     for n, p in cls._findSerializedProperties())
+        cls._property_info = info
+        cls._properties_by_tag = dict((i.tag, i) for i in info)
+        cls._serialized_properties = collections.OrderedDict(
+            (i.name, i.property) for i in info)
+
 
 class Component(Object):
     """Base class for everything that can be attached to game objects.
     You need to subclass this class for it to be useful.
     """
+    __metaclass__ = ComponentMeta
 
     # These special attributes are mapped in __getattr__ to components.
     # That said you can write
@@ -22,30 +52,67 @@ class Component(Object):
         assert not game_object.components.has_key(type(self).__name__)
         game_object.components[type(self).__name__] = self
         self.game_object = game_object
+        # Columnar components get their row in the columns right away.
+        initPropertyValues(self)
 
     def destroy(self):
         """Clean up. This method can be overridden in subclasses."""
         pass
 
 
+    @classmethod
+    def _findSerializedProperties(cls):
+        """Return (name, property) tuples of all SerializedProperties of the
+        class, including inherited ones. Base classes come first, then the
+        order of definition. Called once per class by ComponentMeta.
+
+        Override this method in derived classes to serialize other
+        attributes.
+        """
+        found = collections.OrderedDict()
+        for klass in reversed(cls.__mro__):
+            properties = [(n, p) for n, p in vars(klass).items()
+                          if isinstance(p, SerializedProperty)]
+            properties.sort(key=lambda item: item[1]._order)
+            # A redefined property keeps the place of the inherited one.
+            found.update(properties)
+        # skip properties that have been replaced by something else
+        return [(n, p) for n, p in found.items()
+                if getattr(cls, n, None) is p]
+
     @classmethod
     def getClassSerializedProperties(cls):
-        """Return all special property attributes in a dict. Only attributes
-        derived from SerializedProperty are respected.
+        """Return all special property attributes in an ordered dict,
+        including inherited ones. Only attributes derived from
+        SerializedProperty are respected. The dict is shared, don't modify
+        it.
         """
-        d = {}
-        for a, b in cls.__dict__.items():
-            if isinstance(b, SerializedProperty):
-                d[a] = b
-        return d
+        return cls._serialized_properties
+
+    @classmethod
+    def getPropertyInfo(cls):
+        """Return a tuple of PropertyInfo of all serialized properties."""
+        return cls._property_info
+
+    @classmethod
+    def getPropertyInfoByTag(cls, tag):
+        """Return the PropertyInfo of the property with the given xml tag or
+        None.
+        """
+        return cls._properties_by_tag.get(tag)
+
+    @classmethod
+    def getXMLTag(cls):
+        """Name of the xml element of this component class."""
+        return cls._xml_tag
 
     def getSerializedProperties(self):
         """Return all special property attributes' values in a dict.
         Only attributes derived from SerializedProperty are respected.
         """
         d = {}
-        for p, v in type(self).getClassSerializedProperties().iteritems():
-            d[p] = v.getValue(self)
+        for info in self._property_info:
+            d[info.name] = info.property.getValue(self)
         return d
     
     def __getattr__(self, name):
@@ -0,0 +1,56 @@
+"""Built-in components. Each module holds one component class, named like
+the module in CamelCase: module dummycomponent holds DummyComponent, which
+has the xml tag dummy_component.
+
+The package is scanned once when it's imported, the modules themselves are
+only imported when their component is used first. Use getComponentClass()
+to look up a component class by any of these names.
+"""
+
+import importlib
+import os
+import pkgutil
+
+# Find out what components we have
+COMPONENT_MODULES = [name for _, name, _ in
+                     pkgutil.iter_modules([os.path.dirname(__file__)])]
+
+# every name a component has been looked up by -> class
+_classes = {}
+
+
+def _moduleName(name):
+    """Return the module name for a class name, xml tag or module name."""
+    return name.replace("_", "").lower()
+
+def isComponentName(name):
+    """Return True if name is the class name, xml tag or module name of a
+    component in this package. Nothing is imported.
+    """
+    return name in _classes or _moduleName(name) in COMPONENT_MODULES
+
+def getComponentClass(name):
+    """Return the component class for a class name (Mesh), xml tag (mesh) or
+    module name. Its module is imported on first use. Raises ImportError if
+    there is no such component.
+    """
+    try:
+        return _classes[name]
+    except KeyError:
+        pass
+    module_name = _moduleName(name)
+    if module_name not in COMPONENT_MODULES:
+        raise ImportError("no component named {}".format(name))
+    module = importlib.import_module("." + module_name, __name__)
+    for attribute, value in vars(module).items():
+        if (attribute.lower() == module_name and isinstance(value, type) and
+            value.__module__ == module.__name__):
+            cls = value
+            break
+    else:
+        raise ImportError("module {} has no component class".format(
+                          module.__name__))
+    # all other spellings are a single lookup from now on
+    for key in (name, module_name, cls.__name__, cls.getXMLTag()):
+        _classes[key] = cls
+    return cls
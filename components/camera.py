@@ -1,5 +1,5 @@
 from panity.behaviour import Behaviour
 
-class Camera(Behavior):
+class Camera(Behaviour):
     # TODO
     pass
@@ -24,7 +24,9 @@ class Mesh(Component):
                 self.model.reparentTo(self.game_object.transform.node)
 
     def destroy(self):
-        self.model.removeNode()
+        if self.model is not None:
+            self.model.removeNode()
+            self.model = None
 
 # Test
 if __name__ == "__main__":
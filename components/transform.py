@@ -1,34 +1,70 @@
-from panda3d.core import NodePath
+import weakref
+
+from panda3d.core import NodePath, TransformState, VBase3, Quat
 
 from panity.component import Component
-from panity.properties import SerializedPropertyDecorator
+from panity.properties import (SerializedPropertyDecorator, batch,
+                               Vec3PropertyDecorator, QuatPropertyDecorator)
+
+# only needed for the bulk methods
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _vector(value, scratch):
+    """Return value if it's a vector of the type of scratch. Otherwise copy
+    the components of value, e.g. a tuple, a numpy array or a buffer, into
+    scratch and return that. The setters of NodePath copy their arguments,
+    so one scratch vector can be reused for all assignments.
+    """
+    if isinstance(value, type(scratch)):
+        return value
+    scratch.set(*value)
+    return scratch
+
+_vec3 = VBase3()
+_quat = Quat()
+
+# name -> WeakSet of all transforms with that name, anywhere in the scene.
+# Children are also indexed by their parent, see Transform.find().
+_transforms_by_name = {}
+
 
 class Transform(Component):
     """Each game object has exactly one of these. A transform holds data
     about position, rotation, scale and parent relationship.
     
-    In Panity this is a wrapper for a NodePath.
+    In Panity this is a wrapper for a NodePath. World space means relative
+    to the root transform. World space values are cached until the transform
+    or one of its ancestors changes through the properties of Transform.
+    If you change node directly, e.g. with node.setPos(), call invalidate()
+    afterwards, otherwise position, rotation, root etc. stay outdated.
     """
 
     def __init__(self, game_object, name):
         # Component class sets self.game_object = game_object
         Component.__init__(self, game_object)
+        # name -> list of child transforms, None while there are none
+        self._children_by_name = None
+        # transform whose _children_by_name we are in, None for roots
+        self._indexed_parent = None
+        # TransformState relative to the root and the root itself, None
+        # while dirty. If a transform is dirty, all its descendants are, too.
+        self._world_transform = None
+        self._root = None
         self.node = NodePath(name)
         self.node.setPythonTag("transform", self)
+        self._addToIndex()
 
     @classmethod
-    def getClassSerializedProperties(cls):
-        """Return all special property attributes in a dict. Only attributes
-        derived from SerializedProperty are respected.
-
-        On transform component this method always returns local position,
-        -rotation and scale only.
+    def _findSerializedProperties(cls):
+        """On transform component only local position, -rotation and scale
+        are serialized.
         """
-        d = {}
-        d["local_position"] = Transform.local_position
-        d["local_euler_angles"] = Transform.local_euler_angles
-        d["local_scale"] = Transform.local_scale
-        return d
+        return [("local_position", cls.local_position),
+                ("local_euler_angles", cls.local_euler_angles),
+                ("local_scale", cls.local_scale)]
 
     def getSerializedProperties(self):
         """Return all properties for serialization. In the case of transform
@@ -50,56 +86,74 @@ class Transform(Component):
     def name(self, name):
         if name == "render":
             name = "_render"
+        self._removeFromIndex()
         self.node.setName(name)
+        self._addToIndex()
 
-    @SerializedPropertyDecorator
+    @Vec3PropertyDecorator
     def position(self):
-        return self.node.getPos(self.root.node)
+        world = self._world_transform
+        if world is None:
+            world = self._updateWorldTransform()
+        return world.getPos()
     @position.setter
     def position(self, position):
-        self.node.setPos(self.root.node, *position)
+        self.node.setPos(self.root.node, _vector(position, _vec3))
+        self.invalidate()
     
-    @SerializedPropertyDecorator
+    @Vec3PropertyDecorator
     def local_position(self):
         return self.node.getPos()
     @local_position.setter
     def local_position(self, position):
-        self.node.setPos(*position)
+        self.node.setPos(_vector(position, _vec3))
+        self.invalidate()
 
-    @SerializedPropertyDecorator
+    @Vec3PropertyDecorator
     def euler_angles(self):
-        return self.node.getHpr(self.root.node)
+        world = self._world_transform
+        if world is None:
+            world = self._updateWorldTransform()
+        return world.getHpr()
     @euler_angles.setter
     def euler_angles(self, angles):
-        self.node.setHpr(self.root.node, *angles)
+        self.node.setHpr(self.root.node, _vector(angles, _vec3))
+        self.invalidate()
     
-    @SerializedPropertyDecorator
+    @Vec3PropertyDecorator
     def local_euler_angles(self):
         return self.node.getHpr()
     @local_euler_angles.setter
     def local_euler_angles(self, angles):
-        self.node.setHpr(*angles)
+        self.node.setHpr(_vector(angles, _vec3))
+        self.invalidate()
     
-    @SerializedPropertyDecorator
+    @QuatPropertyDecorator
     def rotation(self):
-        return self.node.getQuat(self.root.node)
+        world = self._world_transform
+        if world is None:
+            world = self._updateWorldTransform()
+        return world.getQuat()
     @rotation.setter
     def rotation(self, quaternion):
-        self.node.setQuat(self.root.node, *quaternion)
+        self.node.setQuat(self.root.node, _vector(quaternion, _quat))
+        self.invalidate()
 
-    @SerializedPropertyDecorator
+    @QuatPropertyDecorator
     def local_rotation(self):
         return self.node.getQuat()
     @local_rotation.setter
     def local_rotation(self, quaternion):
-        self.node.setQuat(*quaternion)
+        self.node.setQuat(_vector(quaternion, _quat))
+        self.invalidate()
 
-    @SerializedPropertyDecorator
+    @Vec3PropertyDecorator
     def local_scale(self):
         return self.node.getScale()
     @local_scale.setter
     def local_scale(self, scale):
-        self.node.setScale(*scale)
+        self.node.setScale(_vector(scale, _vec3))
+        self.invalidate()
 
     @SerializedPropertyDecorator
     def parent(self):
@@ -110,22 +164,165 @@ class Transform(Component):
             return p.getPythonTag("transform")
     @parent.setter
     def parent(self, parent):
+        self._removeFromIndex()
         self.node.wrtReparentTo(parent.node)
+        p = self.node.getParent()
+        if p.hasPythonTag("transform"):
+            self._indexed_parent = p.getPythonTag("transform")
+        else:
+            self._indexed_parent = None
+        self._addToIndex()
+        self.invalidate()
 
     @SerializedPropertyDecorator
     def root(self):
-        if self.parent is not self:
-            return self.parent.root()
-        else:
-            return self
+        if self._world_transform is None:
+            self._updateWorldTransform()
+        return self._root
     
     def destroy(self):
         """Ultimately remove this transform. Warning: this might cause errors
         for other components on this game object. Use this only when removing
         the whole GameObject.
         """
+        # The tag is invisible to the garbage collector, the node would keep
+        # this transform alive forever.
+        self._removeFromIndex()
+        self._indexed_parent = None
+        self.node.clearPythonTag("transform")
         self.node.removeNode()
 
+    def find(self, path):
+        """Return the descendant transform at path, e.g. "door/handle" for
+        the child "handle" of the child "door", or None. Takes time
+        proportional to the depth of the path, not to the number of
+        descendants.
+        """
+        transform = self
+        for name in path.split("/"):
+            if not name:
+                continue
+            children = transform._children_by_name
+            if not children or name not in children:
+                return None
+            transform = children[name][0]
+        return transform
+
+    @staticmethod
+    def findAll(name, roots=False):
+        """Return a list of all transforms with the given name. If roots is
+        True, only those without parent transform.
+        """
+        transforms = _transforms_by_name.get(name, ())
+        if roots:
+            return [t for t in transforms if t._indexed_parent is None]
+        return list(transforms)
+
+    @staticmethod
+    def getLocalPositions(transforms):
+        """Return the local positions of a sequence of transforms as numpy
+        array of shape (len(transforms), 3).
+
+        Requires numpy.
+        """
+        if numpy is None:
+            raise ImportError("getLocalPositions requires numpy")
+        positions = [tuple(t.node.getPos()) for t in transforms]
+        return numpy.array(positions, float).reshape(len(transforms), 3)
+
+    @staticmethod
+    def setLocalPositions(transforms, positions):
+        """Set the local positions of a sequence of transforms at once.
+        positions is anything numpy can turn into an array of shape
+        (len(transforms), 3). Transforms that are already at their position
+        are skipped. Listeners of the others' local_position are called as
+        within batch(), each gets a tuple of the three coordinates.
+
+        Requires numpy.
+        """
+        if numpy is None:
+            raise ImportError("setLocalPositions requires numpy")
+        positions = numpy.asarray(positions, float)
+        if positions.shape != (len(transforms), 3):
+            raise ValueError("expected positions of shape ({}, 3), got "
+                             "{}".format(len(transforms), positions.shape))
+        prop = Transform.local_position
+        # nodes store single precision floats, compare in that precision
+        stored = positions.astype(numpy.float32)
+        moved = (Transform.getLocalPositions(transforms) != stored).any(1)
+        # Columns instead of rows, to create few objects the garbage
+        # collector has to track.
+        xs, ys, zs = positions.T.tolist()
+        with batch():
+            for i in moved.nonzero()[0].tolist():
+                transform = transforms[i]
+                transform.node.setPos(xs[i], ys[i], zs[i])
+                transform.invalidate()
+                prop._changed(transform, (xs[i], ys[i], zs[i]))
+
+    def _updateWorldTransform(self):
+        """Compute the world transform and root of this transform and its
+        dirty ancestors. Returns the world transform.
+        """
+        dirty = []
+        transform = self
+        while transform is not None and transform._world_transform is None:
+            dirty.append(transform)
+            transform = transform._indexed_parent
+        if transform is None:
+            # the topmost one is the root, world space is relative to it
+            transform = dirty.pop()
+            transform._world_transform = TransformState.makeIdentity()
+            transform._root = transform
+        for child in reversed(dirty):
+            child._world_transform = transform._world_transform.compose(
+                                                    child.node.getTransform())
+            child._root = transform._root
+            transform = child
+        return self._world_transform
+
+    def invalidate(self):
+        """Mark the world transform of this transform and its descendants
+        dirty. Subtrees that are dirty already are skipped. Call this after
+        changing node directly.
+        """
+        dirty = [self]
+        while dirty:
+            transform = dirty.pop()
+            if transform._world_transform is None:
+                continue
+            transform._world_transform = None
+            transform._root = None
+            if transform._children_by_name:
+                for children in transform._children_by_name.values():
+                    dirty.extend(children)
+
+    def _addToIndex(self):
+        name = self.node.getName()
+        transforms = _transforms_by_name.get(name)
+        if transforms is None:
+            transforms = _transforms_by_name[name] = weakref.WeakSet()
+        transforms.add(self)
+        parent = self._indexed_parent
+        if parent is not None:
+            if parent._children_by_name is None:
+                parent._children_by_name = {}
+            parent._children_by_name.setdefault(name, []).append(self)
+
+    def _removeFromIndex(self):
+        name = self.node.getName()
+        transforms = _transforms_by_name.get(name)
+        if transforms is not None:
+            transforms.discard(self)
+            if not transforms:
+                del _transforms_by_name[name]
+        parent = self._indexed_parent
+        if parent is not None:
+            siblings = parent._children_by_name[name]
+            siblings.remove(self)
+            if not siblings:
+                del parent._children_by_name[name]
+
     def getChildren(self):
         """Return children as Transforms."""
         # this requires the __iter__() method
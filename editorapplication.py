@@ -23,15 +23,24 @@ class EditorApplication(object):
         frame = PanityFrame()
         frame.Show()
 
-        # Keep the global message server ticking, so that we can communicate
-        # with the subprocesses.
-        frame.messageserver_timer = wx.Timer(frame)
-        frame.Bind(wx.EVT_TIMER, messageserver.process, frame.messageserver_timer)
-        frame.messageserver_timer.Start(1000.0/60) # 60 times a second
+        # Let the global message server forward messages from a background
+        # thread as soon as they arrive. Messages for the clients in the
+        # panda3dmanager are handed over to the wx main loop.
+        panda3dmanager.wakeup = lambda: wx.CallAfter(panda3dmanager.process)
+        try:
+            messageserver.start()
+        except NotImplementedError:
+            # Fall back to polling. Keep the global message server ticking, so
+            # that we can communicate with the subprocesses.
+            panda3dmanager.wakeup = None
+            frame.messageserver_timer = wx.Timer(frame)
+            frame.Bind(wx.EVT_TIMER, messageserver.process, frame.messageserver_timer)
+            frame.messageserver_timer.Start(1000.0/60) # 60 times a second
 
-        # Same for the clients in the panda3dmanager.
-        frame.messageclients_timer = wx.Timer(frame)
-        frame.Bind(wx.EVT_TIMER, panda3dmanager.process, frame.messageclients_timer)
-        frame.messageclients_timer.Start(1000.0/60)
+            # Same for the clients in the panda3dmanager.
+            frame.messageclients_timer = wx.Timer(frame)
+            frame.Bind(wx.EVT_TIMER, panda3dmanager.process, frame.messageclients_timer)
+            frame.messageclients_timer.Start(1000.0/60)
 
-        app.MainLoop()
\ No newline at end of file
+        app.MainLoop()
+        messageserver.stop()
\ No newline at end of file
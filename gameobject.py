@@ -1,21 +1,31 @@
 import types
+import weakref
 
 from panda3d.core import NodePath
 
-import components
-from components.transform import Transform
-from object import Object
+from panity import components
+from panity.components.transform import Transform
+from panity.object import Object, unregisterObject
+from panity.properties import clearListeners
+
+UNTAGGED = "Untagged"
+
+# tag -> WeakSet of game objects with that tag
+_objects_by_tag = {}
 
 class GameObject(Object):
     """Base class for all entities. Every game object has a transform component
     by default.
     """
 
-    def __init__(self, name="unnamed game object", components=[]):
+    def __init__(self, name="unnamed game object", components=[],
+                 tag=UNTAGGED):
         Object.__init__(self)
         self.components = {}
         self.transform = Transform(self, name)
         self.components["Transform"] = self.transform
+        self._tag = None
+        self.tag = tag
         for component in components:
             self.addComponent(component)
 
@@ -26,30 +36,75 @@ class GameObject(Object):
     def name(self, value):
         self.transform.name = value
 
+    @property
+    def tag(self):
+        """A name for a group of game objects, see findGameObjectsWithTag."""
+        return self._tag
+    @tag.setter
+    def tag(self, tag):
+        if self._tag is not None:
+            _objects_by_tag[self._tag].discard(self)
+        objects = _objects_by_tag.get(tag)
+        if objects is None:
+            objects = _objects_by_tag[tag] = weakref.WeakSet()
+        objects.add(self)
+        self._tag = tag
+
+    @staticmethod
+    def find(path):
+        """Return the game object at path or None. Without slashes, path is
+        the name of a game object anywhere in the scene. "house/door" is the
+        child "door" of a game object "house" anywhere in the scene,
+        "/house/door" requires "house" to be a root game object.
+
+        Takes time proportional to the depth of the path and the number of
+        game objects with the first name, not to the size of the scene.
+        """
+        names = path.split("/")
+        roots = not names[0]
+        names = [name for name in names if name]
+        if not names:
+            return None
+        rest = "/".join(names[1:])
+        for transform in Transform.findAll(names[0], roots):
+            found = transform.find(rest)
+            if found is not None:
+                return found.game_object
+        return None
+
+    @staticmethod
+    def findWithName(name):
+        """Return a list of all game objects with the given name."""
+        return [t.game_object for t in Transform.findAll(name)]
+
+    @staticmethod
+    def findWithTag(tag):
+        """Return any game object with the given tag or None."""
+        for game_object in _objects_by_tag.get(tag, ()):
+            return game_object
+        return None
+
+    @staticmethod
+    def findGameObjectsWithTag(tag):
+        """Return a list of all game objects with the given tag."""
+        return list(_objects_by_tag.get(tag, ()))
+
     def addComponent(self, component):
-        """component can be class name or class. Instances of components are
-        not allowed. The newly added component object is returned.
+        """component can be class or its name, either CamelCase or as xml
+        tag. Instances of components are not allowed. The newly added
+        component object is returned.
 
         Alternatively you can pass a GameObject instance to a component
         constructor. The effect should be the same.
         """
         if type(component) in types.StringTypes:
-            if component in self.components:
-                raise AttributeError("game object {} already has a {} "+\
-                    "component".format(self.transform.name, str(component)))
-            comp_module = __import__("components."+component.lower(), globals(), locals(), [None])
-            comp_class = getattr(comp_module, component)
-            comp_object = comp_class(self)
-            self.components[component] = comp_object
-        else:
-            # it's a class
-            comp_name = component.__name__
-            if comp_name in self.components:
-                raise AttributeError("game object {} already has a {} "+\
-                    "component".format(self.transform.name, comp_name))
-            comp_object = component(self)
-            # component should add itself to out components dict
-        return comp_object
+            component = components.getComponentClass(component)
+        comp_name = component.__name__
+        if comp_name in self.components:
+            raise AttributeError("game object {} already has a {} "
+                "component".format(self.transform.name, comp_name))
+        # component adds itself to our components dict
+        return component(self)
 
     def getComponent(self, component):
         if self.components.has_key(component):
@@ -65,7 +120,15 @@ class GameObject(Object):
             yield t.game_object
 
     def destroy(self):
-        """Clean up everything."""
+        """Clean up everything. Child game objects are destroyed first, their
+        nodes would go away with this one's anyway.
+        """
+        for child in self.transform.getChildren():
+            child.game_object.destroy()
         for component in self.components.values():
             component.destroy()
-        self.components.clear()
\ No newline at end of file
+            clearListeners(component)
+            unregisterObject(component)
+        self.components.clear()
+        unregisterObject(self)
+        _objects_by_tag[self._tag].discard(self)
@@ -0,0 +1,178 @@
+"""
+asyncio front-end for the messagecenter. Requires Python 3.6 or newer.
+
+The regular MessageClient and MessageServer are driven by calling process()
+often. Here the event loop does that instead: pipe file descriptors are
+registered with loop.add_reader and fake pipes notify the loop, so nothing
+runs while no message arrives.
+
+AsyncMessageClient wraps a MessageClient. Coroutines can send requests and
+await their replies, which lets many requests to several Panda3D instances
+be in flight at the same time:
+
+    client = AsyncMessageClient(MessageClient(pipe))
+    reply = await client.request("editor", PingRequest())
+
+and iterate over incoming messages:
+
+    async for message in client.messages(UI, FOCUS_WINDOW):
+        ...
+
+AsyncMessageServer forwards messages of a MessageServer from the loop.
+
+The loop must support add_reader, i.e. it can't be the ProactorEventLoop on
+Windows.
+"""
+
+import asyncio
+
+from messagecenter import FakeConnection
+
+
+class AsyncMessageClient(object):
+    """Dispatches the messages of a MessageClient from an event loop. The
+    listeners of the MessageClient are still called, so both APIs can be
+    mixed.
+    """
+    def __init__(self, client, loop=None):
+        self.client = client
+        self.loop = loop or asyncio.get_event_loop()
+        # correlation id -> future of the reply
+        self._futures = {}
+        # asyncio.Queue -> (req_type, req_spec) filter of messages()
+        self._subscriptions = {}
+        client.addListener(self._onMessage)
+        pipe = client.pipe
+        # file descriptor registered with the loop
+        self._fd = None
+        if isinstance(pipe, FakeConnection):
+            pipe.notify = self._notify
+        else:
+            self._fd = pipe.fileno()
+            self.loop.add_reader(self._fd, self._process)
+        # Messages may have arrived already.
+        self.loop.call_soon(self._process)
+
+    def close(self):
+        """Stop dispatching from the loop. Pending requests are cancelled.
+        Call this before closing the pipe.
+        """
+        self.client.removeListener(self._onMessage)
+        if self._fd is None:
+            self.client.pipe.notify = None
+        else:
+            self.loop.remove_reader(self._fd)
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+
+    async def request(self, reciever, payload, timeout=None):
+        """Send payload to one reciever and return the payload of its reply.
+        Raises asyncio.TimeoutError if no reply arrives within timeout
+        seconds.
+        """
+        correlation = self.client.request(reciever, payload)
+        future = self._futures[correlation] = self.loop.create_future()
+        self.client.flush()
+        try:
+            return (await asyncio.wait_for(future, timeout)).payload
+        finally:
+            self._futures.pop(correlation, None)
+
+    def reply(self, message, payload):
+        """Answer a request recieved through messages()."""
+        self.client.reply(message, payload)
+        self.client.flush()
+
+    def send(self, reciever, payload):
+        """Send payload to one reciever without waiting for anything."""
+        self.client.unicast(reciever, payload)
+        self.client.flush()
+
+    async def messages(self, req_type=None, req_spec=None):
+        """Asynchronous iterator over incoming messages, optionally only
+        those of one request type and specialisation. Replies to request()
+        are not included. Messages are only collected while iterating.
+        """
+        queue = asyncio.Queue()
+        self._subscriptions[queue] = req_type, req_spec
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            del self._subscriptions[queue]
+
+    def _notify(self, pipe):
+        # Called by the sending thread of a fake pipe.
+        self.loop.call_soon_threadsafe(self._process)
+
+    def _process(self):
+        self.client.process()
+
+    def _onMessage(self, message):
+        if message.reply:
+            future = self._futures.get(message.correlation)
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        for queue, (req_type, req_spec) in self._subscriptions.items():
+            if ((req_type is None or req_type == message.req_type) and
+                (req_spec is None or req_spec == message.req_spec)):
+                queue.put_nowait(message)
+
+
+class AsyncMessageServer(object):
+    """Forwards the messages of a MessageServer from an event loop. Connect
+    and detach pipes through this object, so that the loop learns about
+    them. Don't call process() or start() of the server at the same time.
+    """
+    def __init__(self, server, loop=None):
+        self.server = server
+        self.loop = loop or asyncio.get_event_loop()
+        # name -> file descriptor of real pipes registered with the loop
+        self._readers = {}
+        for name, pipe in list(server.pipes.items()):
+            self._register(name, pipe)
+
+    def connectPipe(self, name, pipe):
+        self.server.connectPipe(name, pipe)
+        self._register(name, pipe)
+
+    def detachPipe(self, name):
+        """Detach the named pipe from the server and the loop and return
+        it.
+        """
+        self._unregister(name)
+        return self.server.detachPipe(name)
+
+    def close(self):
+        """Remove all pipes from the loop. They stay connected to the
+        server.
+        """
+        for name in list(self._readers):
+            self._unregister(name)
+        for pipe in self.server.pipes.values():
+            if isinstance(pipe, FakeConnection):
+                pipe.notify = None
+
+    def _register(self, name, pipe):
+        if isinstance(pipe, FakeConnection):
+            def notify(pipe):
+                self.loop.call_soon_threadsafe(self._forward, name)
+            pipe.notify = notify
+        else:
+            fd = pipe.fileno()
+            self.loop.add_reader(fd, self._forward, name)
+            self._readers[name] = fd
+        self.loop.call_soon(self._forward, name)
+
+    def _unregister(self, name):
+        fd = self._readers.pop(name, None)
+        if fd is not None:
+            self.loop.remove_reader(fd)
+
+    def _forward(self, name):
+        self.server.forward(name)
+        if name not in self.server.pipes:
+            # closed by the other side
+            self._unregister(name)
@@ -11,10 +11,17 @@ wx panel and the messageserver run in the same process, thus using real pipes
 would be slow. We use a fake pipe for that channel. The server's "process"
 function is called from wx, too.
 
+Alternatively the server runs in a background thread (MessageServer.start)
+that sleeps until a real pipe becomes readable or a fake pipe notifies it.
+In that mode the wx side doesn't poll either. The GUI ends of the fake pipes
+get a notify function which schedules one call of the clients' "process"
+in the wx main loop (see Panda3dManager.wakeup).
+
 All pipes are connected to MessageServer and the server reads the "recievers"
 attribute of each message and forwards it according to that.
 Recievers can either be one client, multiple or a group like ALL (including
-the sender) or OTHERS.
+the sender) or OTHERS. Named groups of clients can be set up with
+MessageServer.addToGroup and used like a client name.
 
 Communication partners in the regular case:
 
@@ -38,21 +45,80 @@ Panda3d only gets a pipe and wraps it into a MessageClient.
 """
 
 import collections
+import numbers
+import os
+import struct
+import threading
+import time
+import traceback
+from multiprocessing import Pipe
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+try:
+    from collections.abc import Iterable
+except ImportError:
+    from collections import Iterable
+
+# Python 3 compatibility, for the messageasync module
+try:
+    basestring
+except NameError:
+    basestring = str
+    StandardError = Exception
+
+try:
+    from multiprocessing.connection import wait as _wait
+except ImportError:
+    # Python 2 doesn't have connection.wait. On POSIX select does the same,
+    # since connections expose their file descriptors through fileno().
+    if os.name == "posix":
+        import select
+        def _wait(connections, timeout=None):
+            return select.select(connections, [], [], timeout)[0]
+    else:
+        _wait = None
+
+from messagestats import MessageStats
+
+# If set, every client and server records message stats. See messagestats.
+STATS_ENABLED = bool(os.environ.get("PANITY_MESSAGE_STATS"))
 
 # reciever types
 ALL, OTHERS = RECIEVER_TYPES = range(2)
 
+# What to do with a message for a full queue, see MessageServer
+DROP_OLDEST, BLOCK, SPILL = QUEUE_POLICIES = range(3)
+
 # request types
-LOG, UI, COMMAND = REQ_TYPES = range(3)
+LOG, UI, COMMAND, DATA = REQ_TYPES = range(4)
 
 # request specialisations
 ADD_GAME_OBJECT, REMOVE_GAME_OBJECT,\
-OPEN_WINDOW, CLOSE_WINDOW, RESIZE_WINDOW, FOCUS_WINDOW = REQ_SPECS = range(6)
+OPEN_WINDOW, CLOSE_WINDOW, RESIZE_WINDOW, FOCUS_WINDOW,\
+BUFFER_READY, DUMP_STATS, PING = REQ_SPECS = range(9)
+
+# names for stats output
+_REQ_TYPE_NAMES = dict(zip(REQ_TYPES, ["LOG", "UI", "COMMAND", "DATA"]))
+_REQ_SPEC_NAMES = dict(zip(REQ_SPECS, [
+    "ADD_GAME_OBJECT", "REMOVE_GAME_OBJECT", "OPEN_WINDOW", "CLOSE_WINDOW",
+    "RESIZE_WINDOW", "FOCUS_WINDOW", "BUFFER_READY", "DUMP_STATS", "PING"]))
 
 class LogRequest(object):
     """Request for logging/printing something."""
     req_type = LOG
 
+class DumpStatsRequest(LogRequest):
+    """Ask the reciever to print the stats of its message client."""
+    req_spec = DUMP_STATS
+
+class PingRequest(LogRequest):
+    """Send with MessageClient.request or messageasync to see whether the
+    reciever is responsive. The reciever replies with the same request.
+    """
+    req_spec = PING
+
 class UIRequest(object):
     """UI Requests are not saved in a history. They're only used for
     the user interface.
@@ -63,6 +129,12 @@ class CommandRequest(object):
     """Commands are all saved in a global history and should be undo-able."""
     req_type = COMMAND
 
+class DataRequest(object):
+    """Data requests announce bulk data that is transferred outside of the
+    pipes, e.g. through shared memory. See the sharedmemory module.
+    """
+    req_type = DATA
+
 
 class AddGameObjectRequest(CommandRequest):
     """Create a game object with the default name and save the submitted
@@ -96,6 +168,9 @@ class CloseWindowRequest(UIRequest):
 
 class ResizeWindowRequest(UIRequest):
     req_spec = RESIZE_WINDOW
+    # Only the latest of several queued resizes of a window gets delivered.
+    # See Message.key.
+    coalesce = ("window_id",)
     def __init__(self, window_id, width, height):
         self.window_id = window_id
         self.width = width
@@ -106,43 +181,78 @@ class FocusWindowRequest(UIRequest):
     def __init__(self, window_id):
         self.window_id = window_id
 
+class BufferReadyRequest(DataRequest):
+    """Sent by sharedmemory.SharedConnection.send. The reciever should read
+    the slot with SharedConnection.read and release it afterwards.
+    kind is an arbitrary number that tells the reciever what the data is.
+    """
+    req_spec = BUFFER_READY
+    def __init__(self, slot, length, kind=0):
+        self.slot = slot
+        self.length = length
+        self.kind = kind
 
-# The following code is deprecated since multiprocessing.dummy.connection.Pipe
-# offers more or less the same functionality.
-
-# class FakeConnection(object):
-#     """Used by FakePipe only. Not really usable otherwise."""
-#     def __init__(self):
-#         self.query1 = []
-#         self.query2 = []
 
-#     def send(self, payload):
-#         self.query2.append(payload)
+class FakeConnection(object):
+    """Used by FakePipe only. Not really usable otherwise.
 
-#     def recv(self):
-#         return self.query1.pop()
+    Sending appends to the peer's inbox and calls the peer's notify
+    function, if one is set. That's how a waiting MessageServer or GUI learns
+    about new messages without polling. notify is called with the receiving
+    connection as only argument, from the thread that sent the message.
+    """
+    def __init__(self):
+        self.inbox = collections.deque()
+        self.peer = None
+        self.notify = None
 
-#     def poll(self):
-#         return self.query1 != []
+    def send(self, payload):
+        peer = self.peer
+        peer.inbox.append(payload)
+        if peer.notify is not None:
+            peer.notify(peer)
 
-# def FakePipe():
-#     """Simulated pipe for communicating inside one process, where
-#     race conditions can't occur. Tries to copy multiprocessing.Pipe.
-#     """
-#     con1 = FakeConnection()
-#     con2 = FakeConnection()
-#     con1.query2 = con2.query1
-#     con2.query2 = con1.query1
-#     return con1, con2
+    def recv(self):
+        return self.inbox.popleft()
 
+    def poll(self, timeout=0.0):
+        """Never blocks, timeout is accepted for compatibility only."""
+        return len(self.inbox) > 0
 
+def FakePipe():
+    """Simulated pipe for communicating inside one process. Tries to copy
+    multiprocessing.Pipe, but objects are passed by reference.
+    Appending to and popping from a deque is atomic, so one thread may write
+    while another one reads.
+    """
+    con1 = FakeConnection()
+    con2 = FakeConnection()
+    con1.peer = con2
+    con2.peer = con1
+    return con1, con2
 
 
 class Message(object):
     """This is what gets sent through the pipe.
     It contains information about recievers and a payload.
+
+    Between processes only the recievers, the coalescing key and the encoded
+    payload (data) are transferred. The payload is decoded when it's accessed
+    for the first time, so the server can forward messages without ever
+    looking into them.
+
+    A message with a correlation id is a request that expects a reply (see
+    MessageClient.reply) or, if reply is True, the reply to the request with
+    that id. For those the server fills in the name of the sender, so that
+    the reciever knows where to send the reply.
+
+    Payload classes can have a "coalesce" attribute, a tuple of names of
+    integer attributes. Messages then get a key made of req_type, req_spec and
+    the values of these attributes. If several messages with the same key
+    and recievers are waiting in a queue, only the latest one is delivered.
     """
-    def __init__(self, recievers, payload):
+    def __init__(self, recievers, payload=None, data=None, key=None,
+                 correlation=None, reply=False):
         """Arguments:
         if recievers is an integer, it is expected to be ALL or OTHERS
         if it is a string, it's considered a name of a client
@@ -150,26 +260,575 @@ class Message(object):
         considered to be client names
 
         payload should be one of the Request classes.
+        data is the encoded payload. Pass it instead of payload when reading
+        a message from a pipe.
+        key is the coalescing key. It's taken from the payload if not given.
+        correlation is an integer that identifies a request and its reply.
+        reply tells whether this is the reply to a request.
         """
         self.recievers = recievers
-        self.payload = payload
+        self._payload = payload
+        self._data = data
+        if key is None and payload is not None:
+            key = coalescingKey(payload)
+        self.key = key
+        self.correlation = correlation
+        self.reply = reply
+        # Name of the sending client. Set by the server for messages with a
+        # correlation id only.
+        self.sender = None
+        # Times (time.time()) of sending and forwarding. Only set if the
+        # sending client records stats.
+        self.sent = None
+        self.forwarded = None
+
+    @property
+    def payload(self):
+        if self._payload is None and self._data is not None:
+            self._payload = decodePayload(self._data)
+        return self._payload
+    @payload.setter
+    def payload(self, payload):
+        self._payload = payload
+        self._data = None
+
+    @property
+    def data(self):
+        """The payload encoded as byte string. Cached after first use."""
+        if self._data is None:
+            self._data = encodePayload(self._payload)
+        return self._data
+
+    @property
+    def req_type(self):
+        """The payload's req_type. Doesn't decode the payload."""
+        if self._payload is not None:
+            return getattr(self._payload, "req_type", None)
+        return _header.unpack_from(self._data)[0]
+
+    @property
+    def req_spec(self):
+        """The payload's req_spec. Doesn't decode the payload."""
+        if self._payload is not None:
+            return getattr(self._payload, "req_spec", None)
+        return _header.unpack_from(self._data)[1]
+
+    @property
+    def size(self):
+        """Length of the encoded payload or 0 if it has never been encoded."""
+        if self._data is None:
+            return 0
+        return len(self._data)
+
+    def getStatsKey(self):
+        """Name of the request type and specialisation for MessageStats."""
+        key = self.req_type, self.req_spec
+        name = _stats_keys.get(key)
+        if name is None:
+            name = _stats_keys[key] = "{}/{}".format(
+                _REQ_TYPE_NAMES.get(key[0], key[0]),
+                _REQ_SPEC_NAMES.get(key[1], key[1]))
+        return name
+
+# cache of names for Message.getStatsKey
+_stats_keys = {}
+
+
+def coalescingKey(payload):
+    """Return the coalescing key of a payload or None. See Message."""
+    attributes = getattr(payload, "coalesce", None)
+    if attributes is None:
+        return None
+    key = (payload.req_type, payload.req_spec) + tuple(
+        getattr(payload, a) for a in attributes)
+    for value in key:
+        if not isinstance(value, numbers.Integral):
+            return None
+    return key
+
+
+# Payload encoding. Every encoded payload starts with a header made of its
+# req_type, req_spec and the encoding used for the rest. Requests registered
+# with registerRequest are packed with struct, everything else is pickled.
+_STRUCT, _PICKLED = range(2)
+# req_type and req_spec of payloads that don't have them
+_UNKNOWN = 255
+_header = struct.Struct("!BBB")
+_uint16 = struct.Struct("!H")
+# codecs by encoded header and by class
+_codecs = {}
+_codecs_by_class = {}
+
+class _RequestCodec(object):
+    """Packs the attributes of one request class into a byte string and
+    back. Numeric attributes are packed with a fixed layout, strings follow
+    with a length prefix each.
+    """
+    def __init__(self, cls, fields):
+        self.cls = cls
+        self.header = _header.pack(cls.req_type, cls.req_spec, _STRUCT)
+        self.numbers = [name for name, fmt in fields if fmt != "s"]
+        self.strings = [name for name, fmt in fields if fmt == "s"]
+        self.struct = struct.Struct("!" + "".join(
+            fmt for name, fmt in fields if fmt != "s"))
+        self.offset = _header.size + self.struct.size
+
+    def encode(self, payload):
+        d = payload.__dict__
+        parts = [self.header, self.struct.pack(*[d[n] for n in self.numbers])]
+        for name in self.strings:
+            string = d[name].encode("utf-8")
+            parts.append(_uint16.pack(len(string)))
+            parts.append(string)
+        return b"".join(parts)
+
+    def decode(self, data):
+        # Don't call __init__, fill the attributes directly.
+        payload = object.__new__(self.cls)
+        d = dict(zip(self.numbers,
+                     self.struct.unpack_from(data, _header.size)))
+        offset = self.offset
+        for name in self.strings:
+            length, = _uint16.unpack_from(data, offset)
+            offset += 2
+            d[name] = data[offset:offset+length].decode("utf-8")
+            offset += length
+        payload.__dict__ = d
+        return payload
+
+def registerRequest(cls, fields):
+    """Make payloads of class cls travel in a compact binary format instead
+    of being pickled.
+
+    Arguments:
+    cls -- a request class with req_type and req_spec. No other registered
+           class must have the same combination of both.
+    fields -- list of (attribute name, format) tuples. The format is a
+              struct format character (e.g. "i", "q", "d", "?") or "s" for a
+              string.
+
+    Payloads whose attributes don't fit the formats (e.g. None or a string
+    where a number is expected) are pickled as before.
+    """
+    codec = _RequestCodec(cls, fields)
+    assert codec.header not in _codecs, ("req_type {} with req_spec {} is "
+        "registered already").format(cls.req_type, cls.req_spec)
+    _codecs[codec.header] = codec
+    _codecs_by_class[cls] = codec
+
+def encodePayload(payload):
+    codec = _codecs_by_class.get(type(payload))
+    if codec is not None:
+        try:
+            return codec.encode(payload)
+        except (struct.error, AttributeError, KeyError, TypeError):
+            pass
+    return (_header.pack(getattr(payload, "req_type", _UNKNOWN),
+                         getattr(payload, "req_spec", _UNKNOWN),
+                         _PICKLED) +
+            pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+
+def decodePayload(data):
+    codec = _codecs.get(data[:_header.size])
+    if codec is None:
+        return pickle.loads(data[_header.size:])
+    return codec.decode(data)
+
+registerRequest(AddGameObjectRequest, [("go_id", "q")])
+registerRequest(RemoveGameObjectRequest, [("go_id", "q")])
+registerRequest(OpenWindowRequest, [("window_id", "i"), ("handle", "q"),
+                                    ("width", "i"), ("height", "i")])
+registerRequest(CloseWindowRequest, [("window_id", "i")])
+registerRequest(ResizeWindowRequest, [("window_id", "i"), ("width", "i"),
+                                      ("height", "i")])
+registerRequest(FocusWindowRequest, [("window_id", "i")])
+registerRequest(DumpStatsRequest, [])
+registerRequest(PingRequest, [])
+registerRequest(BufferReadyRequest, [("slot", "i"), ("length", "I"),
+                                     ("kind", "i")])
+
+
+# A frame bundles multiple messages, so that they can be sent with one system
+# call. Layout (network byte order):
+#   frame:     count (I), count * message
+#   message:   reciever kind (B), recievers, key length (B), key,
+#              payload length (I), payload (see encodePayload)
+#   recievers: nothing for ALL and OTHERS, one name for _NAME,
+#              name count (H) followed by names for _NAMES.
+#              If the message has timestamps, _TIMED is added to the kind
+#              and the times of sending and forwarding (d, d) follow.
+#              If it has a correlation id, _CORRELATED is added to the kind
+#              and the id (q), the reply flag (?) and the sender name follow.
+#   name:      length (H), utf-8 encoded name
+#   key:       key length * signed integer (q)
+_NAME, _NAMES = 2, 3
+_TIMED = 0x80
+_CORRELATED = 0x40
+_timestamps = struct.Struct("!dd")
+_correlation = struct.Struct("!q?")
+_uint8 = struct.Struct("!B")
+_uint32 = struct.Struct("!I")
+_int64 = struct.Struct("!q")
+
+def _encodeName(name):
+    name = name.encode("utf-8")
+    return _uint16.pack(len(name)) + name
+
+def encodeFrame(messages):
+    """Encode a list of Message objects into a byte string."""
+    parts = [_uint32.pack(len(messages))]
+    for message in messages:
+        recievers = message.recievers
+        flags = 0 if message.sent is None else _TIMED
+        if message.correlation is not None:
+            flags |= _CORRELATED
+        if isinstance(recievers, int):
+            parts.append(_uint8.pack(recievers | flags))
+        elif isinstance(recievers, basestring):
+            parts.append(_uint8.pack(_NAME | flags))
+            parts.append(_encodeName(recievers))
+        else:
+            recievers = list(recievers)
+            parts.append(_uint8.pack(_NAMES | flags))
+            parts.append(_uint16.pack(len(recievers)))
+            parts.extend(_encodeName(r) for r in recievers)
+        if flags & _TIMED:
+            parts.append(_timestamps.pack(message.sent,
+                                          message.forwarded or 0.0))
+        if flags & _CORRELATED:
+            parts.append(_correlation.pack(message.correlation,
+                                           message.reply))
+            parts.append(_encodeName(message.sender or u""))
+        key = message.key
+        if key is None:
+            parts.append(_uint8.pack(0))
+        else:
+            parts.append(_uint8.pack(len(key)))
+            parts.extend(_int64.pack(k) for k in key)
+        data = message.data
+        parts.append(_uint32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+def decodeFrame(frame):
+    """Reverse of encodeFrame. Payloads stay encoded until they're used."""
+    def name(offset):
+        length, = _uint16.unpack_from(frame, offset)
+        offset += 2
+        return frame[offset:offset+length].decode("utf-8"), offset+length
+
+    count, = _uint32.unpack_from(frame, 0)
+    offset = 4
+    messages = []
+    for _ in range(count):
+        kind, = _uint8.unpack_from(frame, offset)
+        offset += 1
+        timed = kind & _TIMED
+        correlated = kind & _CORRELATED
+        kind &= ~(_TIMED | _CORRELATED)
+        if kind == _NAME:
+            recievers, offset = name(offset)
+        elif kind == _NAMES:
+            n, = _uint16.unpack_from(frame, offset)
+            offset += 2
+            recievers = []
+            for _ in range(n):
+                r, offset = name(offset)
+                recievers.append(r)
+        else:
+            recievers = kind
+        if timed:
+            sent, forwarded = _timestamps.unpack_from(frame, offset)
+            offset += _timestamps.size
+        if correlated:
+            correlation, reply = _correlation.unpack_from(frame, offset)
+            sender, offset = name(offset + _correlation.size)
+        n, = _uint8.unpack_from(frame, offset)
+        offset += 1
+        key = None
+        if n:
+            key = struct.unpack_from("!%dq" % n, frame, offset)
+            offset += 8 * n
+        length, = _uint32.unpack_from(frame, offset)
+        offset += 4
+        message = Message(recievers, data=frame[offset:offset+length], key=key)
+        if timed:
+            message.sent = sent
+            message.forwarded = forwarded or None
+        if correlated:
+            message.correlation = correlation
+            message.reply = reply
+            message.sender = sender or None
+        messages.append(message)
+        offset += length
+    return messages
+
+def sendFrame(pipe, messages):
+    """Send a list of messages through a pipe at once. Messages for fake
+    pipes are passed as they are, for real pipes they're encoded.
+    """
+    if isinstance(pipe, FakeConnection):
+        pipe.send(messages)
+    else:
+        pipe.send_bytes(encodeFrame(messages))
+
+def recvFrame(pipe):
+    """Reverse of sendFrame. Returns a list of messages."""
+    if isinstance(pipe, FakeConnection):
+        return pipe.recv()
+    return decodeFrame(pipe.recv_bytes())
+
+def coalesce(messages):
+    """Return a list of the given messages without those that are superseded
+    by a later message with the same key and recievers.
+    """
+    latest = {}
+    for i, message in enumerate(messages):
+        if message.key is not None:
+            latest[message.key, _hashable(message.recievers)] = i
+    if not latest:
+        return messages
+    return [m for i, m in enumerate(messages) if m.key is None or
+            latest[m.key, _hashable(m.recievers)] == i]
+
+def _hashable(recievers):
+    if isinstance(recievers, (int, basestring)):
+        return recievers
+    return tuple(recievers)
+
+
+class _Outbox(object):
+    """Messages waiting to be sent through one pipe. A message with a
+    coalescing key replaces a queued one with the same key and recievers.
+    """
+    def __init__(self, pipe=None, writer=None, name=None):
+        self.pipe = pipe
+        # _Writer that sends the messages, or None to send them directly
+        self.writer = writer
+        # name of the reciever, if known
+        self.name = name
+        self.messages = []
+        self.bytes = 0
+        self._sizes = []
+        self._count = 0
+        self._keys = {}
+        # indices of messages that may be dropped, oldest first
+        self._droppable = collections.deque()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, message, size=0, droppable=False):
+        """Queue a message. size is added to self.bytes. If droppable is
+        True, the message can be removed again with dropOldest.
+        """
+        if message.key is not None:
+            key = message.key, _hashable(message.recievers)
+            i = self._keys.get(key)
+            if i is not None:
+                self._remove(i)
+            self._keys[key] = len(self.messages)
+        if droppable:
+            self._droppable.append(len(self.messages))
+        self.messages.append(message)
+        self._sizes.append(size)
+        self.bytes += size
+        self._count += 1
+
+    def dropOldest(self):
+        """Remove the oldest droppable message. Returns False if there is
+        none.
+        """
+        while self._droppable:
+            if self._remove(self._droppable.popleft()):
+                return True
+        return False
+
+    def _remove(self, i):
+        # Leave a hole to keep the other indices valid, take() skips it.
+        if self.messages[i] is None:
+            return False
+        self.messages[i] = None
+        self.bytes -= self._sizes[i]
+        self._count -= 1
+        return True
+
+    def take(self):
+        """Return all queued messages and empty the outbox."""
+        messages = self.messages
+        if len(messages) != self._count:
+            messages = [m for m in messages if m is not None]
+        self.messages = []
+        self.bytes = 0
+        self._sizes = []
+        self._count = 0
+        self._keys = {}
+        self._droppable = collections.deque()
+        return messages
+
+
+class _Writer(object):
+    """Sends messages through a real pipe from its own thread. If the
+    reciever stops reading, e.g. because it's busy loading a big model, only
+    this thread blocks. Messages then pile up in a bounded queue, and what
+    happens when it's full depends on the request type of each new message:
+
+    DROP_OLDEST -- the oldest queued message that may be dropped is removed.
+    BLOCK -- the message is queued anyway and the server stops reading from
+             its sender until the queue has space again (see MessageServer).
+    SPILL -- the message is queued anyway, beyond the limit.
+
+    The server never waits for a writer.
+
+    Coalescing (see Message) also applies to the queue.
+    """
+    def __init__(self, name, pipe, limit, policies, server):
+        self.name = name
+        self.pipe = pipe
+        # for recording stats
+        self.server = server
+        self.limit = limit
+        self.policies = policies
+        self.queue = _Outbox(pipe)
+        self.sent = self.dropped = self.spilled = self.blocked = 0
+        self.busy = False
+        self.closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run,
+                                        name="message writer " + name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, messages):
+        with self._cond:
+            if self.closed:
+                self.dropped += len(messages)
+                return
+            queue = self.queue
+            for message in messages:
+                policy = self.policies.get(message.req_type, SPILL)
+                if len(queue) >= self.limit:
+                    if policy == DROP_OLDEST and queue.dropOldest():
+                        self.dropped += 1
+                    elif policy == BLOCK:
+                        self.blocked += 1
+                    else:
+                        self.spilled += 1
+                queue.append(message, len(message.data),
+                             droppable=policy == DROP_OLDEST)
+            self._cond.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until everything queued has been sent. Returns False if
+        that didn't happen within timeout seconds.
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while (self.queue or self.busy) and not self.closed:
+                if end is None:
+                    self._cond.wait()
+                else:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+        return True
+
+    def full(self):
+        """Return True if the queue is at its limit."""
+        with self._cond:
+            return len(self.queue) >= self.limit and not self.closed
+
+    def close(self):
+        """Stop the thread. Queued messages are discarded."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"depth": len(self.queue), "bytes": self.queue.bytes,
+                    "sent": self.sent, "dropped": self.dropped,
+                    "spilled": self.spilled, "blocked": self.blocked,
+                    "busy": self.busy}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.queue and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                was_full = len(self.queue) >= self.limit
+                messages = self.queue.take()
+                self.busy = True
+            if was_full:
+                # let the server read from paused senders again
+                self.server._wake()
+            try:
+                sendFrame(self.pipe, messages)
+            except (IOError, OSError, EOFError, ValueError):
+                # The reciever is gone.
+                with self._cond:
+                    self.closed = True
+                    self.busy = False
+                    self.dropped += len(messages)
+                    self._cond.notify_all()
+                return
+            stats = self.server.stats
+            if stats is not None:
+                now = time.time()
+                for message in messages:
+                    if message.forwarded is not None:
+                        stats.time("queued for", self.name,
+                                   now - message.forwarded)
+                stats.count("written to", self.name, len(messages),
+                            sum(m.size for m in messages))
+            with self._cond:
+                self.busy = False
+                self.sent += len(messages)
+                self._cond.notify_all()
+
 
 # TODO: Move this to another module, so that subprocesses don't import yet
 # another global messageserver.
 class MessageClient(object):
     """One end of a pipe. This is the preferred way of using a pipe."""
-    def __init__(self, pipe):
-        """Pipe should be a multiprocessing.Pipe or
-        multiprocessing.dummy.connection.Pipe (fake pipe).
+    def __init__(self, pipe, max_count=256, max_bytes=65536, max_delay=0.05):
+        """Pipe should be one end of a multiprocessing.Pipe or FakePipe.
+
+        Outgoing messages are queued and sent as one frame at the end of
+        process(), or as soon as the queue holds max_count messages,
+        max_bytes bytes of payload, or its oldest message is max_delay seconds
+        old. Call flush() to send them right away. Messages to a fake pipe
+        are sent immediately, there is no system call to save.
         """
         self.pipe = pipe
         self.listeners = []
         self.type_listeners = {}
+        # (req_type, req_spec) -> listeners
+        self.spec_listeners = {}
+        # Dispatch table, (req_type, req_spec) -> tuple of all listeners
+        # for that combination. Filled on demand.
+        self._dispatch = {}
+        # recieved messages that haven't been dispatched yet
+        self._inbox = []
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._outbox = _Outbox()
+        self._outbox_time = 0.0
+        self._immediate = isinstance(pipe, FakeConnection)
+        # last correlation id used by request()
+        self._correlation = 0
+        # MessageStats or None. See the messagestats module.
+        self.stats = MessageStats() if STATS_ENABLED else None
 
-    def addListener(self, listener, req_type=None):
+    def addListener(self, listener, req_type=None, req_spec=None):
         """Add a listener (function) that is invoked every time a message
         arrives. If req_type is not None, that listener will be activated only
-        if a message payload has that request type.
+        if a message payload has that request type. If req_spec is given,
+        too, only messages with that request specialisation are passed.
         Every listener can only be used once for a target. So you can't assign
         the same function twice to a specific req_type. You also can't assign
         a listener to all types (req_type=None) more than once. The second try
@@ -179,35 +838,78 @@ class MessageClient(object):
         listener -- a function
         req_type -- one of the request types specified in this module
                     (E.g. UI, COMMAND, LOG). Leave at None for all types.
+        req_spec -- one of the request specialisations specified in this
+                    module (E.g. RESIZE_WINDOW). Requires req_type.
         """
         if req_type is None:
-            if listener not in self.listeners:
-                self.listeners.append(listener)
+            assert req_spec is None, "req_spec requires a req_type"
+            listeners = self.listeners
+        elif req_spec is None:
+            listeners = self.type_listeners.setdefault(req_type, [])
         else:
-            if not self.type_listeners.has_key(req_type):
-                self.type_listeners[req_type] = []
-            if listener not in self.type_listeners[req_type]:
-                self.type_listeners[req_type].append(listener)
+            listeners = self.spec_listeners.setdefault((req_type, req_spec),
+                                                       [])
+        if listener not in listeners:
+            listeners.append(listener)
+            self._dispatch.clear()
 
-    def removeListener(self, listener, req_type=None):
+    def removeListener(self, listener, req_type=None, req_spec=None):
         """Remove a listener. If req_type is None, only listeners listening
         to all types will be removed. To remove a listener that listens for
-        e.g. req_type=UI you need to specify that.
+        e.g. req_type=UI you need to specify that. Same for req_spec.
         This function throws a ValueError if no such listener can be found.
         """
-        if req_type is None:
+        try:
+            if req_type is None:
                 self.listeners.remove(listener)
-        else:
-            try:
+            elif req_spec is None:
                 self.type_listeners[req_type].remove(listener)
-            except KeyError:
-                raise ValueError("No such listener")
+            else:
+                self.spec_listeners[req_type, req_spec].remove(listener)
+        except KeyError:
+            raise ValueError("No such listener")
+        self._dispatch.clear()
+
+    def _getListeners(self, req_type, req_spec):
+        """Return a tuple of all listeners for messages of the given type
+        and specialisation. Cached until listeners are added or removed.
+        """
+        key = req_type, req_spec
+        listeners = self._dispatch.get(key)
+        if listeners is None:
+            listeners = tuple(self.listeners +
+                              self.type_listeners.get(req_type, []) +
+                              self.spec_listeners.get(key, []))
+            self._dispatch[key] = listeners
+        return listeners
 
     def sendMessage(self, message):
-        """Send a message through the pipe. Message should be an instance of
-        Message. Otherwise there might be problems on the reading side.
+        """Queue a message for sending through the pipe. Message should be an
+        instance of Message. Otherwise there might be problems on the reading
+        side.
         """
-        self.pipe.send(message)
+        if self.stats is not None:
+            message.sent = time.time()
+        if self._immediate:
+            sendFrame(self.pipe, [message])
+            if self.stats is not None:
+                self.stats.count("sent", message.getStatsKey())
+            return
+        outbox = self._outbox
+        if not outbox:
+            self._outbox_time = time.time()
+        outbox.append(message, len(message.data))
+        if self.stats is not None:
+            self.stats.count("sent", message.getStatsKey(), 1, message.size)
+        if (len(outbox) >= self.max_count or
+            outbox.bytes >= self.max_bytes or
+            time.time() - self._outbox_time >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        """Send all queued messages as one frame."""
+        if self._outbox:
+            sendFrame(self.pipe, self._outbox.take())
 
     def broadcast(self, payload):
         """Convenience method.
@@ -215,16 +917,16 @@ class MessageClient(object):
         specified payload. Most of the time you won't need this.
         """
         m = Message(recievers=ALL, payload=payload)
-        self.pipe.send(m)
+        self.sendMessage(m)
 
     def multicast(self, recievers, payload):
         """Convenience method.
         Send a message to multiple recievers with the specified payload.
         """
         assert not isinstance(recievers, basestring)
-        assert isinstance(recievers, collections.Iterable)
+        assert isinstance(recievers, Iterable)
         m = Message(recievers=recievers, payload=payload)
-        self.pipe.send(m)
+        self.sendMessage(m)
 
     def unicast(self, reciever, payload):
         """Convenience method.
@@ -232,40 +934,172 @@ class MessageClient(object):
         """
         assert isinstance(reciever, basestring)
         m = Message(recievers=reciever, payload=payload)
-        self.pipe.send(m)
+        self.sendMessage(m)
 
     def others(self, payload):
         """Convenience method.
         Send a message to all others.
         """
         m = Message(recievers=OTHERS, payload=payload)
-        self.pipe.send(m)
+        self.sendMessage(m)
+
+    def request(self, reciever, payload):
+        """Send a message to one reciever that expects a reply and return
+        its correlation id. The reply arrives like any other message, with
+        the same correlation id and reply set to True. See messageasync for
+        awaiting replies.
+        """
+        assert isinstance(reciever, basestring)
+        self._correlation += 1
+        m = Message(recievers=reciever, payload=payload,
+                    correlation=self._correlation)
+        self.sendMessage(m)
+        return self._correlation
+
+    def reply(self, message, payload):
+        """Answer a message that has been sent with request()."""
+        assert message.correlation is not None and not message.reply
+        m = Message(recievers=message.sender, payload=payload,
+                    correlation=message.correlation, reply=True)
+        self.sendMessage(m)
 
     def process(self, *args, **kwargs):
+        """Pass all recieved messages to the listeners, then send everything
+        that has been queued in the meantime. Positional arguments, e.g. of
+        wx events or Panda3D tasks, are ignored.
+
+        If the keyword argument max_ms is given, dispatching stops after that
+        many milliseconds. The remaining messages are dispatched in the next
+        call, so a burst of messages is spread over several frames. At least
+        one message is dispatched per call. If a listener raises, the
+        messages after the current one are kept for the next call, too.
+        """
+        max_ms = kwargs.pop("max_ms", None)
+        inbox = self._inbox
         while self.pipe.poll():
-            message = self.pipe.recv()
-            for listener in self.listeners:
-                listener(message)
-            rt = message.payload.req_type
-            if self.type_listeners.has_key(rt):
-                for listener in self.type_listeners[rt]:
-                    listener(message)
+            inbox.extend(recvFrame(self.pipe))
+        if inbox:
+            inbox = coalesce(inbox)
+            self._inbox = []
+            stats = self.stats
+            deadline = None
+            if max_ms is not None:
+                deadline = time.time() + max_ms / 1000.0
+            done = 0
+            try:
+                for message in inbox:
+                    done += 1
+                    if stats is not None:
+                        dispatched = time.time()
+                    for listener in self._getListeners(message.req_type,
+                                                       message.req_spec):
+                        listener(message)
+                    if stats is not None:
+                        self._recordDispatch(message, dispatched)
+                    if deadline is not None and time.time() >= deadline:
+                        break
+            finally:
+                if done < len(inbox):
+                    self._inbox[:0] = inbox[done:]
+        self.flush()
+
+    @property
+    def pending(self):
+        """Number of recieved messages that process() hasn't dispatched
+        yet, because it ran out of time.
+        """
+        return len(self._inbox)
+
+    def _recordDispatch(self, message, dispatched):
+        stats = self.stats
+        key = message.getStatsKey()
+        stats.count("recieved", key, 1, message.size)
+        stats.time("handled", key, time.time() - dispatched)
+        if message.sent is not None:
+            stats.time("latency", key, dispatched - message.sent)
+            if message.forwarded is not None:
+                stats.time("sent to forwarded", key,
+                           message.forwarded - message.sent)
+                stats.time("forwarded to dispatched", key,
+                           dispatched - message.forwarded)
 
 
 class MessageServer(object):
     """Connection of all pipes which processes forwarding.
     There should be only one server.
+
+    The server can run in two modes. Either process() is called often, e.g.
+    from a timer, and polls every pipe. Or start() is called once and a
+    background thread waits for incoming messages and forwards them as soon
+    as they arrive. The thread sleeps while nothing happens.
+
+    Messages to real pipes are written by one thread per pipe, so a
+    subprocess that doesn't read can never block the server. Each of these
+    threads has a queue that holds up to queue_limit messages. policies maps
+    request types to DROP_OLDEST, BLOCK or SPILL and decides what happens to
+    a message for a full queue (see _Writer). Request types not in policies
+    spill. Use getQueueStats to see how the queues are doing.
+
+    A client that sends BLOCK messages to a full queue is paused: the server
+    doesn't read from its pipe until the queue has space again. Its messages
+    wait in the pipe, and once the pipe buffer is full, the client's own
+    sends block. process() and the background thread pause clients, forward()
+    doesn't, because event loops would keep reporting the pipe as readable.
     """
-    def __init__(self):
+    default_policies = {LOG: DROP_OLDEST, UI: DROP_OLDEST, COMMAND: SPILL,
+                        DATA: SPILL}
+
+    def __init__(self, queue_limit=1000, policies=None):
+        self.queue_limit = queue_limit
+        self.policies = dict(MessageServer.default_policies)
+        if policies is not None:
+            self.policies.update(policies)
         self.pipes = {}
+        # MessageStats or None. See the messagestats module.
+        self.stats = MessageStats() if STATS_ENABLED else None
+        # Guards self.pipes while the background thread is running.
+        self._lock = threading.RLock()
+        self._thread = None
+        self._running = False
+        # The background thread waits on this pipe, too. Writing to it wakes
+        # the thread up, e.g. when a fake pipe got a message.
+        self._waker_r = self._waker_w = None
+        self._woken = False
+        # group name -> set of client names
+        self.groups = {}
+        # Routing table, rebuilt whenever pipes or groups change. Maps client
+        # and group names to tuples of outboxes. Messages wait in the outboxes
+        # until they're sent as one frame per pipe at the end of a round.
+        self._outboxes = {}
+        self._routes = {}
+        self._all = ()
+        self._others = {}
+        # outboxes that got messages in the current round
+        self._pending = []
+        # _Writer -> names of clients that sent it BLOCK messages in the
+        # current round
+        self._blockers = {}
+        # name of a paused client -> the full _Writer it waits for
+        self._paused = {}
 
     def connectPipe(self, name, pipe):
         """Neither the name nor the pipe connection must be used already.
         AssertionError is thrown if one of both is the case.
         """
-        assert name not in self.pipes.keys()
-        assert pipe not in self.pipes.values()
-        self.pipes[name] = pipe
+        with self._lock:
+            assert name not in self.pipes
+            assert pipe not in self.pipes.values()
+            assert name not in self.groups
+            self.pipes[name] = pipe
+            if isinstance(pipe, FakeConnection):
+                pipe.notify = self._wake
+            writer = None
+            if not isinstance(pipe, FakeConnection):
+                writer = _Writer(name, pipe, self.queue_limit, self.policies,
+                                 self)
+            self._outboxes[name] = _Outbox(pipe, writer, name)
+            self._updateRoutes()
+        self._wake()
 
     def detachPipe(self, pipe):
         """Detach the pipe from the server, but keep the object alive and
@@ -273,63 +1107,301 @@ class MessageServer(object):
         Arguments:
         pipe -- can either be a name or a Connection object
         """
-        if isinstance(pipe, basestring):
-            con = self.pipes[name]
-            del self.pipes[name]
-            return con
-        for name in self.pipes.keys():
-            if self.pipes[name] == pipe:
-                con = self.pipes[name]
-                del self.pipes[name]
-                return con
+        with self._lock:
+            if isinstance(pipe, basestring):
+                name = pipe
+                con = self.pipes.pop(name)
+            else:
+                for name, con in self.pipes.items():
+                    if con == pipe:
+                        del self.pipes[name]
+                        break
+                else:
+                    return
+            if isinstance(con, FakeConnection):
+                con.notify = None
+            self._paused.pop(name, None)
+            outbox = self._outboxes.pop(name)
+            if outbox in self._pending:
+                self._pending.remove(outbox)
+            if outbox.writer is not None:
+                outbox.writer.close()
+            for members in self.groups.values():
+                members.discard(name)
+            self._updateRoutes()
+        self._wake()
+        return con
+
+    def getQueueStats(self):
+        """Return a dict with the state of the outgoing queue of every real
+        pipe by name. Each value is a dict with the keys
+        depth -- number of queued messages
+        bytes -- size of the queued payloads
+        sent -- number of messages sent so far
+        dropped -- messages removed because of DROP_OLDEST or a dead reciever
+        spilled -- messages queued beyond the limit
+        blocked -- BLOCK messages queued beyond the limit, each of them
+                   paused its sender
+        busy -- whether the writer is currently sending
+        """
+        with self._lock:
+            return dict((name, o.writer.stats())
+                        for name, o in self._outboxes.items()
+                        if o.writer is not None)
+
+    def drain(self, timeout=None):
+        """Wait until all messages forwarded so far have been written to the
+        pipes. Returns False if that didn't happen within timeout seconds.
+        """
+        with self._lock:
+            writers = [o.writer for o in self._outboxes.values()
+                       if o.writer is not None]
+        for writer in writers:
+            if not writer.drain(timeout):
+                return False
+        return True
+
+    def addToGroup(self, group, name):
+        """Add the named client to a group. Messages sent to the group name
+        are delivered to all of its members. The group is created if it
+        doesn't exist. Group names must not be used as client names.
+        """
+        with self._lock:
+            assert group not in self.pipes
+            self.groups.setdefault(group, set()).add(name)
+            self._updateRoutes()
+
+    def removeFromGroup(self, group, name):
+        """Reverse of addToGroup. Empty groups are removed."""
+        with self._lock:
+            members = self.groups[group]
+            members.discard(name)
+            if not members:
+                del self.groups[group]
+            self._updateRoutes()
+
+    def _updateRoutes(self):
+        """Precompute the outboxes for every possible reciever, so that
+        routing a message doesn't depend on the number of clients.
+        """
+        outboxes = self._outboxes
+        self._all = tuple(outboxes.values())
+        self._others = dict(
+            (name, tuple(o for n, o in outboxes.items() if n != name))
+            for name in outboxes)
+        routes = dict((name, (o,)) for name, o in outboxes.items())
+        for group, members in self.groups.items():
+            routes[group] = tuple(outboxes[n] for n in members
+                                  if n in outboxes)
+        self._routes = routes
 
     def process(self, *args, **kwargs):
-        """Process all messages. This method should be called often."""
-        for name, pipe in self.pipes.iteritems():
-            while pipe.poll():
-                message = pipe.recv()
-
-                if message.payload.req_type == LOG:
-                    #print "log ",message.payload
-                    pass
-                elif message.payload.req_type == COMMAND:
-                    #print "command ", message.payload
-                    pass
-
-                if isinstance(message.recievers, int):
-                    # must be ALL or OTHERS
-                    if message.recievers == ALL:
-                        for p in self.pipes.items():
-                            p.send(message)
-                    elif message.recievers == OTHERS:
-                        recievers = dict(self.pipes)
-                        # remove the pipe we are reading from
-                        del recievers[name]
-                        message.recievers = recievers.keys()
-                        for r in recievers.values():
-                            r.send(message)
-                    else:
-                        raise StandardError("fail1")
-
-                elif isinstance(message.recievers, basestring):
-                    # must be a reciever name
-                    if message.recievers == name:
-                        # Someone sent a message to himself. Discard it
-                        print ("Message from {} was not delivered,"
-                              " because it was sent to itself.").format(name)
-                        continue
-                    if message.recievers in self.pipes.keys():
-                        self.pipes[message.recievers].send(message)
-                    else:
-                        raise StandardError("fail2")
-
-                elif isinstance(message.recievers, collections.Iterable):
-                    # must be a list of reciever names
-                    for rec in message.recievers:
-                        if rec in self.pipes.keys():
-                            self.pipes[rec].send(message)
-                        else:
-                            raise StandardError("fail3")
+        """Process all messages. This method should be called often, unless
+        the server has been started with start().
+        """
+        for name, pipe in self.pipes.items():
+            if name in self._paused and self._isPaused(name):
+                continue
+            self._processPipe(name, pipe)
+        self._flush()
+
+    def forward(self, name):
+        """Read everything that is waiting on the named pipe and forward it.
+        For event loops that know which pipe has become readable, see
+        messageasync. A pipe whose other end has been closed is detached.
+        """
+        with self._lock:
+            pipe = self.pipes.get(name)
+            if pipe is None:
+                return
+            try:
+                self._processPipe(name, pipe)
+            except EOFError:
+                self.detachPipe(name)
+            self._flush()
+
+    def start(self):
+        """Forward messages from a background thread. Instead of polling
+        every pipe, the thread waits until one of the real pipes becomes
+        readable or a fake pipe notifies it. Don't call process() while the
+        server is running.
+
+        Raises NotImplementedError on platforms where waiting on pipes is not
+        supported (Windows with Python 2). Keep calling process() there.
+        """
+        if _wait is None:
+            raise NotImplementedError("waiting on pipes is not supported "
+                                      "on this platform")
+        if self._thread is not None:
+            return
+        self._waker_r, self._waker_w = Pipe(duplex=False)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve,
+                                        name="message server")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread started with start() and wait for it."""
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake()
+        self._thread.join()
+        self._thread = None
+        self._waker_r.close()
+        self._waker_w.close()
+        self._waker_r = self._waker_w = None
+
+    def _wake(self, *args):
+        """Interrupt the background thread's waiting. Used as notify function
+        of fake pipes. Multiple calls before the thread wakes up are merged
+        into one.
+        """
+        if self._waker_w is not None and not self._woken:
+            self._woken = True
+            self._waker_w.send_bytes(b"!")
+
+    def _serve(self):
+        waker = self._waker_r
+        while self._running:
+            with self._lock:
+                real = dict((pipe, name) for name, pipe in self.pipes.items()
+                            if not isinstance(pipe, FakeConnection) and
+                            not self._isPaused(name))
+            ready = _wait(list(real) + [waker])
+            with self._lock:
+                if waker in ready:
+                    # Reset the flag first, so that any notification arriving
+                    # after this point causes a new wakeup.
+                    self._woken = False
+                    while waker.poll():
+                        waker.recv_bytes()
+                    for name, pipe in list(self.pipes.items()):
+                        if (isinstance(pipe, FakeConnection) and
+                                not self._isPaused(name)):
+                            self._servePipe(name, pipe)
+                for pipe in ready:
+                    if pipe is not waker:
+                        self._servePipe(real[pipe], pipe)
+                self._flush()
+
+    def _servePipe(self, name, pipe):
+        """_processPipe for the background thread, which must not die of
+        a single broken pipe or frame. Errors are printed and the thread
+        goes on serving the other pipes.
+        """
+        try:
+            self._processPipe(name, pipe)
+        except EOFError:
+            # The other end has been closed, e.g. because the subprocess
+            # died. Waiting on it would spin forever.
+            self.detachPipe(pipe)
+        except Exception:
+            traceback.print_exc()
+
+    def _processPipe(self, name, pipe):
+        """Read all frames from one pipe and queue their messages for
+        forwarding. Payloads are not decoded.
+        """
+        while pipe.poll():
+            frame = recvFrame(pipe)
+            if self.stats is not None:
+                self.stats.count("recieved from", name, len(frame),
+                                 sum(m.size for m in frame))
+            for message in frame:
+                try:
+                    self._route(name, message)
+                except StandardError:
+                    # e.g. an unknown reciever. Don't lose the rest of the
+                    # frame because of one bad message.
+                    traceback.print_exc()
+
+    def _route(self, name, message):
+        """Queue a message from the named sender in the outboxes of its
+        recievers.
+        """
+        recievers = message.recievers
+        if isinstance(recievers, int):
+            # must be ALL or OTHERS
+            if recievers == ALL:
+                targets = self._all
+            elif recievers == OTHERS:
+                targets = self._others[name]
+            else:
+                raise StandardError("fail1")
+
+        elif isinstance(recievers, basestring):
+            # must be a reciever or group name
+            if recievers == name:
+                # Someone sent a message to himself. Discard it
+                print("Message from {} was not delivered, because it was "
+                      "sent to itself.".format(name))
+                return
+            try:
+                targets = self._routes[recievers]
+            except KeyError:
+                raise StandardError("fail2")
+
+        elif isinstance(recievers, Iterable):
+            # must be a list of reciever or group names
+            try:
+                targets = set()
+                for rec in recievers:
+                    targets.update(self._routes[rec])
+            except KeyError:
+                raise StandardError("fail3")
+
+        if message.sent is not None:
+            message.forwarded = time.time()
+        if message.correlation is not None:
+            message.sender = name
+        pending = self._pending
+        block = self.policies.get(message.req_type) == BLOCK
+        for outbox in targets:
+            if not outbox:
+                pending.append(outbox)
+            outbox.append(message)
+            if block and outbox.writer is not None:
+                self._blockers.setdefault(outbox.writer, set()).add(name)
+        if self.stats is not None:
+            for outbox in targets:
+                self.stats.count("forwarded to", outbox.name)
+
+    def _flush(self):
+        """Send the queued messages, one frame per reciever. Never waits for
+        a writer, clients that sent BLOCK messages to a full one are paused
+        instead.
+        """
+        pending = self._pending
+        self._pending = []
+        for outbox in pending:
+            try:
+                if outbox.writer is None:
+                    sendFrame(outbox.pipe, outbox.take())
+                else:
+                    outbox.writer.put(outbox.take())
+            except Exception:
+                # One reciever must not keep the others from getting their
+                # messages.
+                traceback.print_exc()
+        if self._blockers:
+            blockers = self._blockers
+            self._blockers = {}
+            for writer, names in blockers.items():
+                if writer.full():
+                    for name in names:
+                        self._paused[name] = writer
+
+    def _isPaused(self, name):
+        """Return True if the named client has to wait for a full writer."""
+        writer = self._paused.get(name)
+        if writer is None:
+            return False
+        if writer.full():
+            return True
+        del self._paused[name]
+        return False
 
 # set global instance
 messageserver = MessageServer()
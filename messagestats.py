@@ -0,0 +1,126 @@
+"""
+Optional instrumentation for the messagecenter.
+
+MessageClient and MessageServer get a MessageStats object in their "stats"
+attribute if the environment variable PANITY_MESSAGE_STATS is set (the
+Panda3D subprocesses inherit it), or if one is assigned by hand. They then
+count messages and bytes and measure how long messages take between sending,
+forwarding and dispatching, per request type and per endpoint.
+
+Call dump() to get a readable summary, e.g. through
+Panda3dManager.dumpMessageStats.
+"""
+
+import math
+import threading
+import time
+
+
+class Histogram(object):
+    """Distribution of durations. Bucket i counts durations shorter than
+    2**i microseconds, so a few dozen buckets cover everything from
+    microseconds to minutes.
+    """
+    BUCKETS = 32
+
+    def __init__(self):
+        self.counts = [0] * Histogram.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, seconds):
+        # Timestamps from different processes can be slightly off.
+        if seconds < 0.0:
+            seconds = 0.0
+        microseconds = seconds * 1e6
+        if microseconds < 1.0:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(microseconds, 2)) + 1,
+                         Histogram.BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if self.minimum is None or seconds < self.minimum:
+            self.minimum = seconds
+        if self.maximum is None or seconds > self.maximum:
+            self.maximum = seconds
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, p):
+        """Return the upper bound in seconds of the bucket that contains the
+        p-th percentile (0 < p <= 100).
+        """
+        if not self.count:
+            return 0.0
+        limit = self.count * p / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= limit:
+                return min(2 ** bucket / 1e6, self.maximum)
+        return self.maximum
+
+
+class MessageStats(object):
+    """Counters and histograms, grouped by category (e.g. "sent" or
+    "latency") and key (e.g. a request type or an endpoint name).
+    Thread-safe, since the MessageServer records from its writer threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far. Rates are measured from here."""
+        with self._lock:
+            self.start = time.time()
+            # (category, key) -> [messages, bytes]
+            self.counters = {}
+            # (category, key) -> Histogram
+            self.histograms = {}
+
+    def count(self, category, key, messages=1, size=0):
+        with self._lock:
+            counter = self.counters.get((category, key))
+            if counter is None:
+                counter = self.counters[category, key] = [0, 0]
+            counter[0] += messages
+            counter[1] += size
+
+    def time(self, category, key, seconds):
+        with self._lock:
+            histogram = self.histograms.get((category, key))
+            if histogram is None:
+                histogram = self.histograms[category, key] = Histogram()
+            histogram.add(seconds)
+
+    def dump(self):
+        """Return all counters and histograms as text table."""
+        with self._lock:
+            elapsed = max(time.time() - self.start, 1e-9)
+            lines = ["message stats of the last {:.1f} s".format(elapsed)]
+            if self.counters:
+                lines.append("{:<40} {:>10} {:>10} {:>12}".format(
+                    "counter", "messages", "msg/s", "bytes/s"))
+            for (category, key), (messages, size) in sorted(
+                                                self.counters.items()):
+                lines.append("{:<40} {:>10} {:>10.1f} {:>12.1f}".format(
+                    "{} {}".format(category, key), messages,
+                    messages / elapsed, size / elapsed))
+            if self.histograms:
+                lines.append("{:<40} {:>10} {:>10} {:>10} {:>10}".format(
+                    "duration (ms)", "count", "mean", "p99", "max"))
+            for (category, key), h in sorted(self.histograms.items()):
+                lines.append(
+                    "{:<40} {:>10} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                    "{} {}".format(category, key), h.count, h.mean * 1e3,
+                    h.percentile(99) * 1e3, h.maximum * 1e3))
+            return "\n".join(lines)
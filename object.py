@@ -1,3 +1,30 @@
+import weakref
+
+# class -> WeakSet of all live objects of that class, including instances of
+# subclasses. Filled by Object.__init__, so every component and game object
+# is in here until it's destroyed or collected.
+_objects_by_type = {}
+
+def registerObject(obj):
+    """Add obj to the type index of findObjectsOfType."""
+    for cls in type(obj).__mro__:
+        if cls is object:
+            break
+        objects = _objects_by_type.get(cls)
+        if objects is None:
+            objects = _objects_by_type[cls] = weakref.WeakSet()
+        objects.add(obj)
+
+def unregisterObject(obj):
+    """Remove obj from the type index, e.g. when it's destroyed. Collected
+    objects drop out by themselves.
+    """
+    for cls in type(obj).__mro__:
+        objects = _objects_by_type.get(cls)
+        if objects is not None:
+            objects.discard(obj)
+
+
 class Object(object):
     """Base class for all game objects and components."""
     @staticmethod
@@ -16,13 +43,19 @@ class Object(object):
     
     @staticmethod
     def findObjectsOfType(typ):
-        # TODO
-        pass
+        """Return a list of all live objects of class typ or subclasses of
+        it. Takes time proportional to the number of results, not to the
+        size of the scene.
+        """
+        return list(_objects_by_type.get(typ, ()))
 
     @staticmethod
     def findObjectOfType(typ):
-        # TODO
-        pass
+        """Return any live object of class typ or a subclass of it, or None.
+        """
+        for obj in _objects_by_type.get(typ, ()):
+            return obj
+        return None
     
     @staticmethod
     def dontDestroyOnLoad(target):
@@ -31,6 +64,7 @@ class Object(object):
         
     def __init__(self):
         self.hideFlags = None
+        registerObject(self)
     
     def getInstanceId(self):
         return id(self)
@@ -4,7 +4,8 @@ from pandac.PandaModules import loadPrcFileData
 from direct.showbase.ShowBase import ShowBase
 
 from messagecenter import *
-from gameobject import GameObject
+from panity.behaviour import scheduler
+from panity.gameobject import GameObject
 from scenegraph import Root
 
 
@@ -16,11 +17,12 @@ class Panda3dInstance(object):
 
     If you aren't 100% sure what you're doing, use the Panda3dManager instead.
     """
-    def __init__(self, pipe, name):
+    def __init__(self, pipe, name, shared=None):
         """Arguments:
         pipe -- Multiprocessing pipe for communication. See messagecenter
                 module for more info.
         name -- Name of this instance.
+        shared -- Optional sharedmemory.SharedConnection for bulk data.
         """
 
         #self.gameobjects = []
@@ -28,6 +30,10 @@ class Panda3dInstance(object):
         self.messageclient = MessageClient(pipe)
         self.name = name
         self.windows = {}
+        self.shared = shared
+        # Functions that handle bulk data from shared memory, by the kind
+        # of BufferReadyRequest. See addDataHandler.
+        self.data_handlers = {}
 
         # set a few default settings
         loadPrcFileData("", "window-type none")
@@ -37,17 +43,28 @@ class Panda3dInstance(object):
         self.base = ShowBase()
         
         # start processing incoming requests
-        self.messageclient.addListener(self.UImessageProcessor, req_type=UI)
+        client = self.messageclient
+        client.addListener(self.openWindowProcessor, UI, OPEN_WINDOW)
+        client.addListener(self.resizeWindowProcessor, UI, RESIZE_WINDOW)
+        client.addListener(self.dumpStatsProcessor, LOG, DUMP_STATS)
+        client.addListener(self.pingProcessor, LOG, PING)
+        if self.shared is not None:
+            client.addListener(self.bufferReadyProcessor, DATA, BUFFER_READY)
 
         # The request processing task should never stop as long as the
         # subprocess exists. This is a wrapper that ensures that and saves
         # us from confusion about "hey, why has this message processing
         # stopped?!"
+        # A burst of messages is spread over several frames instead of
+        # stalling one.
         def messageProcessor(task):
-            self.messageclient.process()
+            self.messageclient.process(max_ms=5)
             return task.cont
         self.base.addTask(messageProcessor, "message processor")
 
+        # update and lateUpdate of all behaviours, every frame
+        scheduler.attach(self.base.taskMgr)
+
         # As soon as the user clicks the window, it should get focus, like any other widget.
         self.base.accept("mouse1", self.focus)
 
@@ -80,15 +97,40 @@ class Panda3dInstance(object):
                                     requireWindow=True)
         return self.base.winList[-1]
 
-    def UImessageProcessor(self, message):
+    def openWindowProcessor(self, message):
+        p = message.payload
+        assert not self.windows.has_key(p.window_id)
+        win = self.addWindow(p.handle, p.width, p.height)
+        self.windows[p.window_id] = win
+
+    def resizeWindowProcessor(self, message):
+        p = message.payload
+        self.resizeWindow(p.window_id, p.width, p.height)
+
+    def dumpStatsProcessor(self, message):
+        if self.messageclient.stats is None:
+            print "{}: message stats are disabled".format(self.name)
+        else:
+            print "{}: {}".format(self.name, self.messageclient.stats.dump())
+
+    def pingProcessor(self, message):
+        self.messageclient.reply(message, message.payload)
+
+    def addDataHandler(self, kind, handler):
+        """Register a function that is called with a memoryview of the data
+        whenever a BufferReadyRequest of the given kind arrives. The view is
+        only valid during the call.
+        """
+        self.data_handlers[kind] = handler
+
+    def bufferReadyProcessor(self, message):
         p = message.payload
-        # TODO: look up the req_spec attribute, not class instance
-        if p.req_spec == OPEN_WINDOW:
-            assert not self.windows.has_key(p.window_id)
-            win = self.addWindow(p.handle, p.width, p.height)
-            self.windows[p.window_id] = win
-        elif p.req_spec == RESIZE_WINDOW:
-            self.resizeWindow(p.window_id, p.width, p.height)
+        try:
+            handler = self.data_handlers.get(p.kind)
+            if handler is not None:
+                handler(self.shared.read(p))
+        finally:
+            self.shared.release(p)
 
     def focus(self, window_id=None):
         """Bring Panda3d to foreground, so that it gets keyboard focus.
@@ -1,8 +1,9 @@
 from multiprocessing import Process, Pipe
-from multiprocessing.dummy.connection import Pipe as FakePipe
 
 from panda3dinstance import Panda3dInstance
-from messagecenter import messageserver, MessageClient, OpenWindowRequest
+from messagecenter import messageserver, MessageClient, OpenWindowRequest,\
+                          FakePipe, DumpStatsRequest
+from sharedmemory import SharedPipe
 
 # TODO: maybe we should only return single objects instead of the
 # _Panda3dInstance composite object. E.g. only return a messageclient
@@ -21,10 +22,13 @@ class Panda3dManager(object):
         with Panda3d instances. In particular you probably want to use the
         messageclient to send requests to the P3d instance.
         """
-        def __init__(self, name, process=None, messageclient=None):
+        def __init__(self, name, process=None, messageclient=None,
+                     shared=None):
             self.name = name
             self.process = process
             self.messageclient = messageclient
+            # sharedmemory.SharedConnection or None
+            self.shared = shared
             self.windows = 0
 
     class P3dInstanceNotFoundException(Exception):
@@ -40,21 +44,46 @@ class Panda3dManager(object):
 
     def __init__(self):
         self.instances = []
+        # Function without arguments that makes the GUI thread call
+        # self.process() soon, e.g. through wx.CallAfter. If set, it's called
+        # whenever a message arrives for one of the message clients. Several
+        # messages arriving before process() runs cause only one call.
+        self.wakeup = None
+        self._wakeup_pending = False
+        # Time budget in milliseconds for each message client per process()
+        # call, so that a burst of messages doesn't freeze the GUI.
+        self.max_ms = 10
 
     def process(self, *args, **kwargs):
         """Call this function often (60 times a second) to call the process
         method on all message clients. Alternatively you can process each
-        message client on your own.
+        message client on your own, or set the wakeup attribute to get
+        process() called on demand only.
         """
+        # Reset before reading, so that messages arriving from now on trigger
+        # another wakeup.
+        self._wakeup_pending = False
+        pending = False
         for i in self.instances:
             if i.messageclient is not None:
-                i.messageclient.process()
-
-    def getPanda3dInstance(self, name):
+                i.messageclient.process(max_ms=self.max_ms)
+                pending = pending or i.messageclient.pending
+        # Not everything could be dispatched in time. Come back soon instead
+        # of waiting for the next message.
+        if pending and self.wakeup is not None:
+            self._wakeup_pending = True
+            self.wakeup()
+
+    def getPanda3dInstance(self, name, shared_memory=None):
         """Start a new Panda3D instance in a process. The instance
         shouldn't open any windows by default, only wrap the recieved pipe
         with a MessageClient and poll for new requests from time to time.
 
+        If shared_memory is a tuple (slots, slot_size), a shared memory
+        channel with that many slots of slot_size bytes per direction is
+        created for bulk data. It's available as the "shared" attribute on
+        both sides. See the sharedmemory module.
+
         Returned object is of type Panda3dManager._Panda3dInstance.
         If an instance with the specified name already exists, no new
         instance will be created but the existing one will be returned.
@@ -63,21 +92,35 @@ class Panda3dManager(object):
         if old:
             return old
 
+        gui_shared = panda_shared = None
+        if shared_memory is not None:
+            gui_shared, panda_shared = SharedPipe(*shared_memory)
+
         panda_pipe, server_pipe = Pipe()
         messageserver.connectPipe(name, server_pipe)
         panda_process = Process(target=Panda3dInstance, args=(
-            panda_pipe, name))
+            panda_pipe, name, panda_shared))
         panda_process.start()
 
         server_pipe2, gui_pipe = FakePipe()
 
         messageserver.connectPipe(name+" gui", server_pipe2)
+        gui_pipe.notify = self._onMessage
         messageclient = MessageClient(gui_pipe)
 
-        p3d = Panda3dManager._Panda3dInstance(name, panda_process, messageclient)
+        p3d = Panda3dManager._Panda3dInstance(name, panda_process, messageclient,
+                                              gui_shared)
         self.instances.append(p3d)
         return p3d
 
+    def _onMessage(self, pipe):
+        """Notify function of the GUI ends of fake pipes. Called from the
+        thread that sent the message.
+        """
+        if self.wakeup is not None and not self._wakeup_pending:
+            self._wakeup_pending = True
+            self.wakeup()
+
     def openWindow(self, p3d, width=500, height=500, handle=None):
         """Open a new window within the specified instance.
         p3d can be either a name or a Panda3dInstance object.
@@ -96,6 +139,18 @@ class Panda3dManager(object):
         p3d.messageclient.unicast(p3d.name, payload)
         return p3d.windows
 
+    def dumpMessageStats(self):
+        """Print the message stats of the server and of all message clients
+        in this process, and ask all Panda3d instances to print theirs.
+        Stats are only recorded if enabled, see the messagestats module.
+        """
+        if messageserver.stats is not None:
+            print "message server: " + messageserver.stats.dump()
+        for i in self.instances:
+            if i.messageclient.stats is not None:
+                print "{} gui: {}".format(i.name, i.messageclient.stats.dump())
+            i.messageclient.unicast(i.name, DumpStatsRequest())
+
     def getInstance(self, name):
         """Returns an Panda3dManager._Panda3dInstance object or None
         if there is no instance with the given name.
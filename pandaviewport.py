@@ -1,8 +1,5 @@
 import sys
 import os
-from multiprocessing import Process, Pipe
-from multiprocessing.dummy.connection import Pipe as FakePipe
-
 import wx
 
 from messagecenter import *
@@ -21,7 +18,8 @@ class PandaViewport(wx.Panel):
         self.p3d_name = p3d_name
         self.p3dinstance = panda3dmanager.getPanda3dInstance(p3d_name)
         self.messageclient = self.p3dinstance.messageclient
-        self.messageclient.addListener(self.UImessageProcessor, UI)
+        self.messageclient.addListener(self.focusWindowProcessor,
+                                       UI, FOCUS_WINDOW)
         # The window is is set in initialize.
         self.window_id = None
 
@@ -72,12 +70,9 @@ class PandaViewport(wx.Panel):
         pass
         # TODO!
 
-    def UImessageProcessor(self, message):
-        p = message.payload
-    
-        if p.req_spec == FOCUS_WINDOW:
-            if p.window_id == self.window_id:
-                self.SetFocus()
+    def focusWindowProcessor(self, message):
+        if message.payload.window_id == self.window_id:
+            self.SetFocus()
 
 # TODO
 # Test
@@ -5,46 +5,294 @@ These are used to
 3. choose the right GUI widgets in the editor
 """
 
+import bisect
+import contextlib
+import itertools
+import traceback
+import weakref
+
+from util import WeakMethod
+
 # I think making this optional this module gets more reusable
 try:
-    from panda3d.core import VBase2, VBase3, VBase4
+    from panda3d.core import VBase2, VBase3, VBase4, Quat
 except ImportError:
     print "".join(["importing Panda3d classes failed. Marshalling those ",
                    "might be a bad idea"])
 
+# only needed for columnar classes
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ChangeJournal(object):
+    """Remembers which properties of which objects have changed.
+
+    Every change increments the global version. Remember the version at
+    some point and ask for everything that changed after it with
+    changesSince(), e.g. to sync another process or to save a scene
+    incrementally. The cost depends on the number of changes, not on the
+    size of the scene.
+
+    Objects are referenced weakly, destroyed objects drop out of the
+    journal.
+    """
+    def __init__(self):
+        self.version = 0
+        # id(obj) -> [weakref to obj, {property: version of last change}]
+        self._objects = {}
+        # (version, weakref, property) for every change, oldest first.
+        # Superseded entries are removed when the log gets longer than
+        # _limit.
+        self._log = []
+        self._limit = 1024
+
+    def record(self, obj, prop):
+        version = self.version = self.version + 1
+        try:
+            entry = self._objects[id(obj)]
+        except KeyError:
+            entry = self._objects[id(obj)] = [self._ref(obj), {}]
+        changed = entry[1]
+        log = self._log
+        if changed.get(prop) == version - 1:
+            # The same property changed again, e.g. while dragging. Its
+            # entry is the last one.
+            log[-1] = (version, entry[0], prop)
+        else:
+            log.append((version, entry[0], prop))
+            if len(log) > self._limit:
+                self._compact()
+        changed[prop] = version
+
+    def changesSince(self, version):
+        """Iterate over (object, property) tuples of all properties that
+        changed after the given version, in the order of their last change.
+        Each tuple is only returned once.
+        """
+        log = self._log
+        # (version + 1,) sorts before all entries of that version
+        for i in xrange(bisect.bisect_left(log, (version + 1,)), len(log)):
+            v, ref, prop = log[i]
+            if self._isLatest(v, ref, prop):
+                yield ref(), prop
+
+    def getDirtyProperties(self, obj, since=0):
+        """Return the set of properties of obj that changed after the given
+        version.
+        """
+        entry = self._objects.get(id(obj))
+        if entry is None:
+            return set()
+        return set(p for p, v in entry[1].items() if v > since)
+
+    def markClean(self, obj):
+        """Forget all changes of obj."""
+        self._objects.pop(id(obj), None)
+
+    def _ref(self, obj):
+        key = id(obj)
+        def forget(ref):
+            entry = self._objects.get(key)
+            if entry is not None and entry[0] is ref:
+                del self._objects[key]
+        return weakref.ref(obj, forget)
+
+    def _isLatest(self, version, ref, prop):
+        """Whether a log entry is the last change of a live object."""
+        obj = ref()
+        if obj is None:
+            return False
+        entry = self._objects.get(id(obj))
+        return (entry is not None and entry[0] is ref and
+                entry[1].get(prop) == version)
+
+    def _compact(self):
+        objects = self._objects
+        log = []
+        for e in self._log:
+            obj = e[1]()
+            if obj is not None:
+                entry = objects.get(id(obj))
+                if (entry is not None and entry[0] is e[1] and
+                    entry[1].get(e[2]) == e[0]):
+                    log.append(e)
+        self._log = log
+        self._limit = max(1024, 2 * len(log))
+
+journal = ChangeJournal()
+
+
+class _Batch(object):
+    """State of batch(). Changes are collected per object and property,
+    in the order they happened first.
+    """
+    def __init__(self):
+        self.depth = 0
+        # (id(obj), property) -> [obj, property, value]
+        self.changes = {}
+        # the same lists in order. OrderedDict is too slow on Python 2.
+        self.order = []
+
+    def record(self, obj, prop, value):
+        change = self.changes.get((id(obj), prop))
+        if change is None:
+            change = self.changes[id(obj), prop] = [obj, prop, value]
+            self.order.append(change)
+        else:
+            change[2] = value
+
+    def flush(self, print_errors=False):
+        """Call the listeners of all recorded changes. If print_errors is
+        True, exceptions of listeners are printed instead of raised.
+        """
+        changes = self.order
+        self.changes = {}
+        self.order = []
+        call = _callPrintingErrors if print_errors else _call
+        # [function, changes], functions aren't necessarily hashable
+        changesets = []
+        for obj, prop, value in changes:
+            d = obj.__dict__
+            for ref in d.get("_listeners", {}).get(prop, ()):
+                f = ref()
+                if f is not None:
+                    call(f, value)
+            for ref in d.get("_changeset_listeners", {}).get(prop, ()):
+                f = ref()
+                if f is None:
+                    continue
+                for function, changeset in changesets:
+                    if function == f:
+                        break
+                else:
+                    changeset = []
+                    changesets.append((f, changeset))
+                changeset.append((obj, prop, value))
+        for f, changeset in changesets:
+            call(f, changeset)
+
+def _call(f, argument):
+    f(argument)
+
+def _callPrintingErrors(f, argument):
+    try:
+        f(argument)
+    except Exception:
+        traceback.print_exc()
+
+_batch = _Batch()
+
+@contextlib.contextmanager
+def batch():
+    """Context manager that defers listeners until the end of the block.
+    Each listener of an object and property is then called only once, with
+    the final value, no matter how often the value changed. Batches can be
+    nested, listeners are called when the outermost one ends.
+
+        with batch():
+            mesh.path = "a"
+            mesh.path = "b"    # reloadModel is called once, with "b"
+
+    If the outermost block raises, the listeners are still called, since
+    the values have changed anyway. Exceptions of listeners are then only
+    printed, so that the original exception propagates.
+    """
+    _batch.depth += 1
+    completed = False
+    try:
+        yield
+        completed = True
+    finally:
+        _batch.depth -= 1
+        if not _batch.depth:
+            _batch.flush(print_errors=not completed)
+
 
 class PropertyBase(object):
     """This is the base class of SerializedProperty and
     SerializedPropertyDecorator that contains methods they both use.
     Not really usable as standalone.
     """
+    def _changed(self, obj, value):
+        """Called whenever the value effectively changed."""
+        journal.record(obj, self)
+        self._invokeListeners(obj, value)
+
     def _invokeListeners(self, obj, value):
-        if hasattr(obj, "_listeners") and self in obj._listeners:
-            for f in obj._listeners[self]:
-                f(value)
+        # __dict__ skips __getattr__ of components
+        d = obj.__dict__
+        listeners = d.get("_listeners")
+        changeset_listeners = d.get("_changeset_listeners")
+        if not listeners and not changeset_listeners:
+            return
+        if _batch.depth:
+            _batch.record(obj, self, value)
+            return
+        if listeners:
+            for ref in listeners.get(self, ()):
+                f = ref()
+                if f is not None:
+                    f(value)
+        if changeset_listeners:
+            for ref in changeset_listeners.get(self, ()):
+                f = ref()
+                if f is not None:
+                    f([(obj, self, value)])
 
-    def addListener(self, obj, function):
+    def addListener(self, obj, function, changeset=False):
         """Add a callback function that is called every time the value is
         effectively changed. The new value is passed as argument.
         obj is the object this property should be watched on.
+
+        If changeset is True, function gets a list of (object, property,
+        value) tuples instead. Within batch() it's called once at the end
+        with all changes it listens to, otherwise with one change.
+
+        Bound methods are referenced weakly, so listening doesn't keep
+        their object alive. The listener is removed when it's collected.
+        Other functions, e.g. lambdas, are kept until they are removed.
         """
-        if not hasattr(obj, "_listeners"):
-            obj._listeners = {}
-            obj._listeners[self] = []
-        elif not obj._listeners.has_key(self):
-            obj._listeners[self] = []
-        obj._listeners[self].append(function)
+        attribute = "_changeset_listeners" if changeset else "_listeners"
+        listeners = obj.__dict__.get(attribute)
+        if listeners is None:
+            listeners = {}
+            setattr(obj, attribute, listeners)
+        refs = listeners.setdefault(self, [])
+        refs.append(_listenerRef(obj, attribute, self, function))
 
     def removeListener(self, obj, function):
-        """Reverse of addListener."""
-        obj._listeners[self].remove(function)
+        """Reverse of addListener. Raises ValueError if function doesn't
+        listen to this property on obj.
+        """
+        d = obj.__dict__
+        for attribute in ("_listeners", "_changeset_listeners"):
+            refs = d.get(attribute, {}).get(self, [])
+            for i, ref in enumerate(refs):
+                if ref() == function:
+                    del refs[i]
+                    return
+        raise ValueError("{} doesn't listen to this property".format(
+                         function))
 
     def removeAllListeners(self, obj):
-        obj._listeners.pop(self, None)
+        for attribute in ("_listeners", "_changeset_listeners"):
+            obj.__dict__.get(attribute, {}).pop(self, None)
 
     def getValue(self, obj):
         return self.__get__(obj)
 
+    def fromXML(self, text):
+        """Reverse of toXML. Returns a value that can be assigned to the
+        property. The text of a list of numbers is converted to a list of
+        floats, everything else is returned as string.
+
+        You can override this method in derived classes if required.
+        """
+        return parseXMLValue(text)
+
     def toXML(self, value):
         """Convert the given value in a way so that it can be stored in XML.
         This is in particular useful for lists and list-like types which are
@@ -64,6 +312,280 @@ class PropertyBase(object):
         return str(value)
 
 
+def clearListeners(obj):
+    """Remove all listeners of all properties of obj."""
+    d = obj.__dict__
+    d.pop("_listeners", None)
+    d.pop("_changeset_listeners", None)
+
+
+class _StrongRef(object):
+    """Stands in for a weak reference to a listener that can't be referenced
+    weakly, e.g. a lambda that would die right away.
+    """
+    __slots__ = ("function",)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self):
+        return self.function
+
+
+def _listenerRef(obj, attribute, prop, function):
+    """Return a reference to a listener of prop on obj, which calls of
+    addListener store in obj.<attribute>. The reference of a bound method
+    removes itself from there when the method's object is collected.
+    """
+    if (getattr(function, "__self__", None) is None or
+        not hasattr(function, "__func__")):
+        # functions, unbound and builtin methods
+        return _StrongRef(function)
+    try:
+        obj_ref = weakref.ref(obj)
+    except TypeError:
+        # dead listeners of such objects are skipped, but stay
+        return WeakMethod(function)
+    def forget(ref):
+        o = obj_ref()
+        if o is None:
+            return
+        listeners = o.__dict__.get(attribute, {})
+        # A new list, in case the old one is being iterated.
+        refs = [r for r in listeners.get(prop, ()) if r is not ref]
+        if refs:
+            listeners[prop] = refs
+        else:
+            listeners.pop(prop, None)
+    return WeakMethod(function, forget)
+
+
+def parseXMLValue(text):
+    """Return text as list of floats if it's a space separated list of
+    numbers, otherwise unchanged.
+    """
+    try:
+        return map(float, text.split(" "))
+    except ValueError:
+        return text
+
+def parseXMLVector(vector, text):
+    """Read the space separated components in text into vector, in place,
+    and return it. Raises ValueError if the number of components is wrong.
+    """
+    parts = text.split()
+    if len(parts) != len(vector):
+        raise ValueError("{!r} doesn't have {} components".format(
+            text, len(vector)))
+    for i, part in enumerate(parts):
+        vector[i] = float(part)
+    return vector
+
+
+class _PropertyLayout(object):
+    """The slots of all SerializedProperties of one class.
+
+    Every property gets an index the first time a class that has it is laid
+    out, and keeps it for all classes where possible, so reading a value is
+    a single lookup in the object's _property_values list. Base classes are
+    laid out first, so subclasses only append their own properties.
+    Properties of unrelated base classes of a class with multiple
+    inheritance may want the same index. One of them then gets another slot
+    in that class, which it remembers per class, see SerializedProperty.slot.
+    """
+    def __init__(self, cls):
+        slots = {}
+        seen = set()
+        for klass in reversed(cls.__mro__):
+            properties = [p for p in vars(klass).values()
+                          if isinstance(p, SerializedProperty)]
+            properties.sort(key=lambda p: p._order)
+            for prop in properties:
+                if prop in seen:
+                    continue
+                seen.add(prop)
+                next_free = max(slots) + 1 if slots else 0
+                if prop.index is None:
+                    prop.index = next_free
+                index = prop.index
+                if index in slots:
+                    # taken by a property of an unrelated base class
+                    index = next_free
+                    prop._remap(cls, index)
+                slots[index] = prop
+        # index -> property
+        self.slots = slots
+        # initial values of an instance, unused slots stay None
+        self.defaults = [None] * (max(slots) + 1 if slots else 0)
+        for index, prop in slots.items():
+            self.defaults[index] = prop.default
+        # properties whose values are changed in place, so that each
+        # instance needs its own copy of the default
+        self.mutable = [(index, prop) for index, prop in slots.items()
+                        if prop.mutable]
+        # _ColumnStore of columnar classes
+        self.store = None
+        if getattr(cls, "_columnar", False):
+            self.store = _ColumnStore(self)
+
+# class -> _PropertyLayout
+_layouts = weakref.WeakKeyDictionary()
+
+def _getLayout(cls):
+    layout = _layouts.get(cls)
+    if layout is None:
+        layout = _layouts[cls] = _PropertyLayout(cls)
+    return layout
+
+def initPropertyValues(obj):
+    """Create the property values of an object from the defaults of its
+    class, unless that happened already. This is done on first access of a
+    property. Component.__init__ calls it, too, so that instances of
+    columnar classes are in the columns right away.
+    """
+    values = obj.__dict__.get("_property_values")
+    if values is None:
+        layout = _getLayout(type(obj))
+        if layout.store is None:
+            values = list(layout.defaults)
+        else:
+            values = layout.store.add(obj, layout.defaults)
+        for index, prop in layout.mutable:
+            values[index] = prop.copy(values[index])
+        obj._property_values = values
+    return values
+
+
+def columnar(cls):
+    """Class decorator. The values of numeric properties (those with a dtype,
+    e.g. FloatProperty) of all instances of the class are kept in one numpy
+    array per property, instead of one Python object per value. That makes
+    bulk operations possible, see SerializedProperty.column, setColumn and
+    filter. Subclasses get columns of their own.
+
+    Requires numpy.
+    """
+    if numpy is None:
+        raise ImportError("columnar classes require numpy")
+    cls._columnar = True
+    return cls
+
+
+class _ColumnStore(object):
+    """Columns of the numeric property values of all instances of one
+    columnar class. Every instance has one row. When an instance is garbage
+    collected, the last row is moved into its place.
+
+    The cycle collector may run in the middle of add() or remove(), so
+    removals are deferred until the store is consistent again.
+    """
+    def __init__(self, layout):
+        self.count = 0
+        self.capacity = 16
+        # by property index, None for non-numeric properties. Replaced
+        # arrays are swapped in place, so that views stay valid.
+        self.columns = [None] * len(layout.defaults)
+        for index, prop in layout.slots.items():
+            if prop.dtype is not None:
+                self.columns[index] = numpy.empty(self.capacity, prop.dtype)
+        # by row
+        self.views = []
+        self.refs = []
+        self._busy = False
+        self._deferred = []
+
+    def add(self, obj, defaults):
+        """Append a row for obj and return its _ColumnView."""
+        self._busy = True
+        try:
+            if self.count == self.capacity:
+                self._grow()
+            row = self.count
+            for index, column in enumerate(self.columns):
+                if column is not None:
+                    column[row] = defaults[index]
+            view = _ColumnView(self.columns, row, defaults)
+            self.views.append(view)
+            self.refs.append(weakref.ref(obj, lambda ref: self.remove(view)))
+            self.count += 1
+        finally:
+            self._busy = False
+        self._removeDeferred()
+        return view
+
+    def remove(self, view):
+        """Remove the row of view, moving the last row into its place."""
+        self._deferred.append(view)
+        if not self._busy:
+            self._removeDeferred()
+
+    def _removeDeferred(self):
+        self._busy = True
+        try:
+            while self._deferred:
+                self._removeRow(self._deferred.pop())
+        finally:
+            self._busy = False
+
+    def _removeRow(self, view):
+        row = view.row
+        last = self.count - 1
+        if row != last:
+            for column in self.columns:
+                if column is not None:
+                    column[row] = column[last]
+            moved = self.views[row] = self.views[last]
+            moved.row = row
+            self.refs[row] = self.refs[last]
+        self.views.pop()
+        self.refs.pop()
+        self.count = last
+
+    def owners(self, rows):
+        """Return the instances of rows, None for collected ones."""
+        self._busy = True
+        try:
+            owners = [self.refs[row]() for row in rows]
+        finally:
+            self._busy = False
+        self._removeDeferred()
+        return owners
+
+    def _grow(self):
+        self.capacity *= 2
+        for index, column in enumerate(self.columns):
+            if column is not None:
+                grown = numpy.empty(self.capacity, column.dtype)
+                grown[:self.count] = column[:self.count]
+                self.columns[index] = grown
+
+
+class _ColumnView(object):
+    """The _property_values of an instance of a columnar class. Numeric
+    values are read from and written to its row of the columns, all others
+    are kept in a list, like for other classes.
+    """
+    __slots__ = ("columns", "row", "values")
+
+    def __init__(self, columns, row, defaults):
+        self.columns = columns
+        self.row = row
+        self.values = list(defaults)
+
+    def __getitem__(self, index):
+        column = self.columns[index]
+        if column is None:
+            return self.values[index]
+        return column.item(self.row)
+
+    def __setitem__(self, index, value):
+        column = self.columns[index]
+        if column is None:
+            self.values[index] = value
+        else:
+            column[self.row] = value
+
+
 class SerializedProperty(PropertyBase):
     """The SerializedProperty is meant to be initiated as a class attribute,
     where it serves as both class- and instance attribute.
@@ -77,12 +599,39 @@ class SerializedProperty(PropertyBase):
     This is the base class which doesn't offer any checks or validation.
     Better use the specialized subclasses instead.
 
+    Values are stored in a list on the object, at the index of the property
+    (see _PropertyLayout). Properties must be class attributes from the
+    start, they can't be added to a class after it has been instantiated.
+
     See the test files, especially serializingtest.py for usage examples.
     """
+    # creation order, for laying out properties in a stable order
+    _counter = itertools.count()
+    # numpy dtype of the values in columnar classes, None if the values
+    # can't be stored in an array
+    dtype = None
+    # True if values are changed in place. Every object then gets a copy
+    # of the default, see copy().
+    mutable = False
+
     def __init__(self, default=None):
         """default value is used as initial value."""
         self.default = default
         self.listeners = {}
+        # slot in the _property_values list of objects, see _PropertyLayout
+        self.index = None
+        # class -> slot, for classes that couldn't use index. None while
+        # there are none.
+        self._remapped = None
+        self._order = next(SerializedProperty._counter)
+        # see _compile
+        self._coerce = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # settings like minimum may have changed, compile again
+        if name not in ("_coerce", "index", "_remapped"):
+            self.__dict__["_coerce"] = None
 
     def __get__(self, obj, cls=None):
         """Return a value when called on object or SerializedProperty instance
@@ -91,50 +640,115 @@ class SerializedProperty(PropertyBase):
         if obj is None:
             # property called on class level. return a nice object
             return self
+        if self._remapped is None:
+            try:
+                return obj._property_values[self.index]
+            except AttributeError:
+                pass
+        try:
+            values = obj._property_values
+        except AttributeError:
+            # laying out the class may remap this property
+            values = initPropertyValues(obj)
+        return values[self.slot(type(obj))]
 
-        if hasattr(obj, "_properties") and obj._properties.has_key(self):
-            return obj._properties[self]
-        else:
-            return self.default
+    def slot(self, cls):
+        """Return the index of this property's value in the _property_values
+        of instances of cls.
+        """
+        if self._remapped is None:
+            return self.index
+        return self._remapped.get(cls, self.index)
+
+    def _remap(self, cls, index):
+        if self._remapped is None:
+            self._remapped = weakref.WeakKeyDictionary()
+        self._remapped[cls] = index
 
     def __set__(self, obj, value):
         """Set a property on an object.
         If the new value is same as current, no checks are run and the value
-        is returned. Otherwise self.check() is run and on failure
-        self.convert(), followed by a second check. If one of the checks is
-        successful, the new value is returned and set, otherwise only False
-        is returned.
-        """
-        # create a properties dict on the object
-        if not hasattr(obj, "_properties"):
-            obj._properties = {}
-            if value == self.default:
-                return value
-        elif obj._properties.has_key(self) and value == obj._properties[self]:
-                # new value is same as old one
-                return value
-        # check the given value
+        is returned. Otherwise it's checked and converted if necessary (see
+        check() and convert()). If that's successful, the new value is
+        returned and set, otherwise only False is returned.
+        """
         try:
-            self.check(value)
-            obj._properties[self] = value
-            self._invokeListeners(obj, value)
+            values = obj._property_values
+        except AttributeError:
+            values = initPropertyValues(obj)
+        index = self.index
+        if self._remapped is not None:
+            index = self._remapped.get(type(obj), index)
+        if value == values[index]:
+            # new value is same as old one
             return value
-        except AssertionError:
-            pass
-        # then try to convert and check again
+        coerce = self._coerce
+        if coerce is None:
+            coerce = self._compile()
         try:
-            value = self.convert(value)
-            self.check(value)
-            obj._properties[self] = value
-            self._invokeListeners(obj, value)
-            return value
-        except (AssertionError, ValueError) as e:
+            value = coerce(value)
+        except (ValueError, TypeError, AssertionError):
             print "warning, setting value "+str(value)+" on obj "+str(obj)+" not possible!"
             return False
+        if value != values[index]:
+            values[index] = value
+            # same as self._changed, inlined
+            journal.record(obj, self)
+            self._invokeListeners(obj, value)
+        return value
+
+    def copy(self, value):
+        """Return a copy of a value. Only used if mutable is True.
+
+        Override this method in derived classes.
+        """
+        return value
+
+    def fromXML(self, text):
+        """The setter converts strings already."""
+        return text
+
+    def _compile(self):
+        """Build the function that __set__ uses to check and convert values.
+        It's built once and again only after a setting of the property has
+        changed.
+
+        Subclasses build straight-line functions in _compileCoercer. If a
+        subclass overrides check or convert, but not _compileCoercer, the
+        generic version, calling check and convert, is used.
+        """
+        cls = type(self)
+        compiler = _definingClass(cls, "_compileCoercer")
+        if (issubclass(compiler, _definingClass(cls, "check")) and
+            issubclass(compiler, _definingClass(cls, "convert"))):
+            coerce = self._compileCoercer()
+        else:
+            coerce = SerializedProperty._compileCoercer(self)
+        self._coerce = coerce
+        return coerce
+
+    def _compileCoercer(self):
+        """Return a function that returns a value that passes check(),
+        converted if necessary. It raises ValueError or TypeError if that's
+        not possible.
+
+        Override this method in derived classes.
+        """
+        check = self.check
+        convert = self.convert
+        def coerce(value):
+            try:
+                check(value)
+                return value
+            except (ValueError, TypeError, AssertionError):
+                value = convert(value)
+                check(value)
+                return value
+        return coerce
 
     def check(self, value):
         """Check a potential value for its correctness and optionally type.
-        AssertionError is thrown if you're unlucky.
+        ValueError is raised if you're unlucky.
 
         Override this method in derived classes.
         """
@@ -150,8 +764,113 @@ class SerializedProperty(PropertyBase):
         """
         pass
 
+    def column(self, cls):
+        """Return a numpy array with the values of this property of all
+        instances of the columnar class cls, one row per instance.
+        Writing to the array changes the values without checks or listeners.
+        It's only valid until an instance of cls is created or destroyed.
+        """
+        store = self._getStore(cls)
+        return store.columns[self.slot(cls)][:store.count]
+
+    def setColumn(self, cls, values):
+        """Set this property on all instances of the columnar class cls at
+        once. values is a single value or a sequence with one value per row
+        (see column). Values are clipped to minimum and maximum, if the
+        property has them. Listeners are called for changed values.
+        """
+        store = self._getStore(cls)
+        column = store.columns[self.slot(cls)][:store.count]
+        values = numpy.asarray(values, column.dtype)
+        minimum = getattr(self, "minimum", None)
+        maximum = getattr(self, "maximum", None)
+        if minimum is not None or maximum is not None:
+            values = numpy.clip(values, minimum, maximum)
+        changed = numpy.nonzero(column != values)[0]
+        column[:] = values
+        changed_values = column[changed].tolist()
+        for obj, value in zip(store.owners(changed), changed_values):
+            if obj is not None:
+                self._changed(obj, value)
+
+    def filter(self, cls, function):
+        """Return all instances of the columnar class cls for which function
+        is true. function gets the column (see column()) and must return an
+        array of booleans, e.g. lambda mass: mass > 10.
+        """
+        store = self._getStore(cls)
+        mask = function(store.columns[self.slot(cls)][:store.count])
+        owners = store.owners(numpy.nonzero(mask)[0])
+        return [obj for obj in owners if obj is not None]
+
+    def _getStore(self, cls):
+        store = _getLayout(cls).store
+        if store is None:
+            raise TypeError("{} is not columnar".format(cls.__name__))
+        index = self.slot(cls)
+        if (index is None or index >= len(store.columns) or
+            store.columns[index] is None):
+            raise TypeError("not a numeric property of {}".format(
+                cls.__name__))
+        return store
+
+
+def _definingClass(cls, name):
+    """Return the class in the MRO of cls that defines the attribute."""
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+
+
+def _checkRange(prop, value):
+    if prop.minimum is not None and value < prop.minimum:
+        raise ValueError("{!r} is less than {!r}".format(value, prop.minimum))
+    if prop.maximum is not None and value > prop.maximum:
+        raise ValueError("{!r} is greater than {!r}".format(value,
+                                                            prop.maximum))
+
+def _compileNumberCoercer(number_type, minimum, maximum):
+    """Return a function that converts values to number_type and clips them
+    to minimum and maximum, either of which may be None.
+    """
+    if minimum is None and maximum is None:
+        def coerce(value):
+            if type(value) is not number_type:
+                value = number_type(value)
+            return value
+    elif maximum is None:
+        minimum = number_type(minimum)
+        def coerce(value):
+            if type(value) is not number_type:
+                value = number_type(value)
+            if value < minimum:
+                return minimum
+            return value
+    elif minimum is None:
+        maximum = number_type(maximum)
+        def coerce(value):
+            if type(value) is not number_type:
+                value = number_type(value)
+            if value > maximum:
+                return maximum
+            return value
+    else:
+        minimum = number_type(minimum)
+        maximum = number_type(maximum)
+        def coerce(value):
+            if type(value) is not number_type:
+                value = number_type(value)
+            if value < minimum:
+                return minimum
+            if value > maximum:
+                return maximum
+            return value
+    return coerce
+
 
 class FloatProperty(SerializedProperty):
+    dtype = "float64"
+
     def __init__(self, minimum=None, maximum=None, default=0.0):
         """When setting values to this, minimum and maximum are checked and the
         given value might get clipped eventually. The default value is not
@@ -163,22 +882,20 @@ class FloatProperty(SerializedProperty):
         self.maximum = maximum
 
     def check(self, value):
-        assert isinstance(value, float)
-        if self.minimum is not None:
-            assert value >= self.minimum
-        if self.maximum is not None:
-            assert value <= self.maximum
+        if not isinstance(value, float):
+            raise ValueError("{!r} is not a float".format(value))
+        _checkRange(self, value)
     
     def convert(self, value):
-        value = float(value)
-        if value < self.minimum:
-            return self.minimum
-        elif self.maximum is not None and value > self.maximum:
-            return self.maximum
-        return value
+        return _compileNumberCoercer(float, self.minimum, self.maximum)(value)
+
+    def _compileCoercer(self):
+        return _compileNumberCoercer(float, self.minimum, self.maximum)
 
 
 class IntegerProperty(SerializedProperty):
+    dtype = "int64"
+
     def __init__(self, minimum=None, maximum=None, default=0):
         """When setting values to this, minimum and maximum are checked and the
         given value might get clipped eventually. The default value is not
@@ -190,19 +907,15 @@ class IntegerProperty(SerializedProperty):
         self.maximum = maximum
 
     def check(self, value):
-        assert isinstance(value, int)
-        if self.minimum is not None:
-            assert value >= self.minimum
-        if self.maximum is not None:
-            assert value <= self.maximum
+        if not isinstance(value, int):
+            raise ValueError("{!r} is not an int".format(value))
+        _checkRange(self, value)
     
     def convert(self, value):
-        value = int(value)
-        if value < self.minimum:
-            return self.minimum
-        elif self.maximum is not None and value > self.maximum:
-            return self.maximum
-        return value
+        return _compileNumberCoercer(int, self.minimum, self.maximum)(value)
+
+    def _compileCoercer(self):
+        return _compileNumberCoercer(int, self.minimum, self.maximum)
 
 
 class UnsignedIntegerProperty(IntegerProperty):
@@ -211,12 +924,18 @@ class UnsignedIntegerProperty(IntegerProperty):
     last bit.
     """
     def check(self, value):
-        assert isinstance(value, int)
-        assert value >= 0
-        if self.minimum is not None:
-            assert value >= self.minimum
-        if self.maximum is not None:
-            assert value <= self.maximum
+        IntegerProperty.check(self, value)
+        if value < 0:
+            raise ValueError("{!r} is negative".format(value))
+
+    def _compileCoercer(self):
+        coerce_int = IntegerProperty._compileCoercer(self)
+        def coerce(value):
+            value = coerce_int(value)
+            if value < 0:
+                raise ValueError("{!r} is negative".format(value))
+            return value
+        return coerce
 
 
 class StringProperty(SerializedProperty):
@@ -224,16 +943,147 @@ class StringProperty(SerializedProperty):
         SerializedProperty.__init__(self, default)
 
     def check(self, value):
-        assert isinstance(value, str)
+        if not isinstance(value, str):
+            raise ValueError("{!r} is not a str".format(value))
 
     def convert(self, value):
         return str(value)
 
+    def _compileCoercer(self):
+        def coerce(value):
+            if type(value) is not str:
+                value = str(value)
+            return value
+        return coerce
+
 
 class PathProperty(StringProperty):
     pass
 
 
+class VectorProperty(SerializedProperty):
+    """Base class of properties whose values are Panda3D vectors.
+
+    Every object has its own vector, which is updated in place on
+    assignment, so assigning doesn't allocate anything. Any sequence of the
+    right length can be assigned, e.g. tuples, other vectors or numpy
+    arrays. Single components can be changed with setComponent.
+    Listeners get the vector itself, copy it if you need to keep the value.
+
+    Requires Panda3D.
+    """
+    mutable = True
+    # number of components
+    size = 0
+    # used by toXML, enough digits to restore single precision floats
+    _xml_format = "%.9g"
+
+    def __init__(self, default=None):
+        """default is a sequence, all zeros if not given."""
+        try:
+            self.vector_type = self._vectorType()
+        except NameError:
+            raise ImportError("vector properties require Panda3D")
+        if default is None:
+            default = (0.0,) * self.size
+        SerializedProperty.__init__(self, self.vector_type(*default))
+        # for comparisons with assigned values
+        self._scratch = self.vector_type()
+        self._xml_format = " ".join([self._xml_format] * self.size)
+
+    def _vectorType(self):
+        """Return the Panda3D class of the values.
+
+        Override this method in derived classes.
+        """
+        raise NotImplementedError
+
+    def __set__(self, obj, value):
+        """Copy the components of value into the object's vector. Returns
+        the vector or False if value doesn't fit.
+        """
+        try:
+            values = obj._property_values
+        except AttributeError:
+            values = initPropertyValues(obj)
+        current = values[self.slot(type(obj))]
+        if value is current:
+            return current
+        try:
+            if len(value) != self.size:
+                raise ValueError("{!r} doesn't have {} components".format(
+                    value, self.size))
+            # compare in the precision of the vector, e.g. 0.1 as float32
+            scratch = self._scratch
+            scratch.set(*value)
+            if current == scratch:
+                return current
+            current.set(*value)
+        except (TypeError, ValueError):
+            print "warning, setting value "+str(value)+" on obj "+str(obj)+" not possible!"
+            return False
+        journal.record(obj, self)
+        self._invokeListeners(obj, current)
+        return current
+
+    def setComponent(self, obj, i, value):
+        """Change component i (e.g. 2 for z) of the object's vector."""
+        try:
+            values = obj._property_values
+        except AttributeError:
+            values = initPropertyValues(obj)
+        current = values[self.slot(type(obj))]
+        previous = current[i]
+        current[i] = float(value)
+        if current[i] != previous:
+            self._changed(obj, current)
+
+    def check(self, value):
+        if not isinstance(value, self.vector_type):
+            raise ValueError("{!r} is not a {}".format(
+                value, self.vector_type.__name__))
+
+    def convert(self, value):
+        return self.vector_type(*value)
+
+    def copy(self, value):
+        return self.vector_type(value)
+
+    def fromXML(self, text):
+        return parseXMLVector(self.vector_type(), text)
+
+    def toXML(self, value):
+        return self._xml_format % tuple(value)
+
+
+class Vec2Property(VectorProperty):
+    size = 2
+    def _vectorType(self):
+        return VBase2
+
+
+class Vec3Property(VectorProperty):
+    size = 3
+    def _vectorType(self):
+        return VBase3
+
+
+class Vec4Property(VectorProperty):
+    size = 4
+    def _vectorType(self):
+        return VBase4
+
+
+class QuatProperty(VectorProperty):
+    """Rotation as quaternion (r, i, j, k), the identity by default."""
+    size = 4
+    def __init__(self, default=(1.0, 0.0, 0.0, 0.0)):
+        VectorProperty.__init__(self, default)
+
+    def _vectorType(self):
+        return Quat
+
+
 
 class SerializedPropertyDecorator(property, PropertyBase):
     """Use this SerializedProperty if you need own getter and setter.
@@ -241,15 +1091,92 @@ class SerializedPropertyDecorator(property, PropertyBase):
     and convertion.
     This class is mainly used by the transform component, as it stores
     its property values on a nodepath.
+    Assigning the current value again is no change, the setter isn't
+    called then. Otherwise the change is journaled and listeners are called
+    after the setter.
     """
     def __init__(self, fget=None, fset=None, fdel=None, doc=None):
 
         def decorated(obj, value):
-            self._invokeListeners(obj, value);
+            if fget is not None and self._equal(fget(obj), value):
+                return
             fset(obj, value)
+            self._changed(obj, value)
 
         super(SerializedPropertyDecorator, self).__init__(
             fget,
             decorated,
             fdel,
-            doc)
\ No newline at end of file
+            doc)
+
+    def _equal(self, current, value):
+        """Return True if value is the same as the current value."""
+        try:
+            return bool(current == value)
+        except (TypeError, ValueError):
+            # e.g. numpy arrays, whose comparison is ambiguous
+            return False
+
+
+class VectorPropertyDecorator(SerializedPropertyDecorator):
+    """SerializedPropertyDecorator for values that are Panda3D vectors, e.g.
+    the position of a transform. Values are written to and read from XML
+    like those of VectorProperty.
+
+    The setter gets whatever was assigned, e.g. a vector, a tuple or a numpy
+    array. It should pass vectors on as they are and copy other sequences
+    into a vector it reuses, instead of allocating a new one each time.
+    """
+    # number of components
+    size = 0
+    _xml_format = "%.9g"
+
+    def __init__(self, fget=None, fset=None, fdel=None, doc=None):
+        try:
+            self.vector_type = self._vectorType()
+        except NameError:
+            raise ImportError("vector properties require Panda3D")
+        # for comparisons with values of other types
+        self._scratch = self.vector_type()
+        self._xml_format = " ".join([self._xml_format] * self.size)
+        SerializedPropertyDecorator.__init__(self, fget, fset, fdel, doc)
+
+    def _vectorType(self):
+        """Return the Panda3D class of the values.
+
+        Override this method in derived classes.
+        """
+        raise NotImplementedError
+
+    def _equal(self, current, value):
+        """Compare with value converted to the vector type, value may be any
+        sequence. The components of the vectors are single precision, so
+        e.g. 0.1 is equal to the 0.1 a vector holds.
+        """
+        if not isinstance(value, self.vector_type):
+            try:
+                if len(value) != self.size:
+                    return False
+                self._scratch.set(*value)
+            except TypeError:
+                return False
+            value = self._scratch
+        return bool(current == value)
+
+    def fromXML(self, text):
+        return parseXMLVector(self.vector_type(), text)
+
+    def toXML(self, value):
+        return self._xml_format % tuple(value)
+
+
+class Vec3PropertyDecorator(VectorPropertyDecorator):
+    size = 3
+    def _vectorType(self):
+        return VBase3
+
+
+class QuatPropertyDecorator(VectorPropertyDecorator):
+    size = 4
+    def _vectorType(self):
+        return Quat
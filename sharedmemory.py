@@ -0,0 +1,156 @@
+"""
+Shared memory channels for bulk data between the wx process and the Panda3D
+subprocesses.
+
+Pipes copy every byte through the kernel twice, which is fine for the small
+requests of the messagecenter but not for large amounts of scene state, e.g.
+the transforms of all game objects. A SharedPipe is a pair of ring buffers in
+shared memory, one for each direction. The data is written into a free slot
+of a ring and only a small BufferReadyRequest travels through the regular
+message pipe, telling the other side which slot to read. The reader gets a
+memoryview on the slot, so nothing is copied on that side, and releases the
+slot when it's done.
+
+Both ends must be created before the subprocess is started, because the
+memory is inherited by the child process. See
+Panda3dManager.getPanda3dInstance.
+"""
+
+import ctypes
+from multiprocessing.sharedctypes import RawArray
+
+from messagecenter import BufferReadyRequest
+
+# slot states
+FREE, READY = range(2)
+
+
+class SharedRing(object):
+    """A fixed number of equally sized slots in shared memory. There must be
+    exactly one writer and one reader process.
+
+    The writer looks for a FREE slot, fills it and marks it READY. The reader
+    marks it FREE again after reading. A slot is only ever changed by the
+    side that currently owns it, so no lock is needed.
+    """
+    def __init__(self, slots=4, slot_size=1 << 20):
+        self.slots = slots
+        self.slot_size = slot_size
+        self._memory = RawArray(ctypes.c_char, slots * slot_size)
+        self._states = RawArray(ctypes.c_int, slots)
+        self._lengths = RawArray(ctypes.c_int, slots)
+        # Only used by the writer. Slots are handed out round robin.
+        self._next = 0
+        # memoryview objects can't be transferred to the subprocess, so the
+        # view is created on first use in each process.
+        self._view = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_view"] = None
+        return state
+
+    @property
+    def view(self):
+        """Writable memoryview of the whole ring, one byte per item."""
+        if self._view is None:
+            view = memoryview(self._memory)
+            if hasattr(view, "cast"):
+                # Python 3 can't assign to views of ctypes' format
+                view = view.cast("B")
+            self._view = view
+        return self._view
+
+    def acquire(self):
+        """Return the index of a free slot or None if the reader still holds
+        all of them. The slot can be filled through slotView().
+        """
+        for i in range(self.slots):
+            slot = (self._next + i) % self.slots
+            if self._states[slot] == FREE:
+                self._next = (slot + 1) % self.slots
+                return slot
+
+    def slotView(self, slot, length=None):
+        """Memoryview of a slot. Without length the whole slot is returned,
+        otherwise its first length bytes.
+        """
+        start = slot * self.slot_size
+        if length is None:
+            length = self.slot_size
+        return self.view[start:start+length]
+
+    def publish(self, slot, length):
+        """Hand a filled slot over to the reader."""
+        assert 0 <= length <= self.slot_size
+        self._lengths[slot] = length
+        self._states[slot] = READY
+
+    def write(self, data):
+        """Copy data into a free slot and publish it. Returns the slot or None
+        if no slot is free or data doesn't fit into one.
+        """
+        length = len(data)
+        if length > self.slot_size:
+            return None
+        slot = self.acquire()
+        if slot is None:
+            return None
+        self.slotView(slot, length)[:] = data
+        self.publish(slot, length)
+        return slot
+
+    def read(self, slot):
+        """Return a memoryview of the published data of a slot. It's only
+        valid until release() is called for that slot.
+        """
+        assert self._states[slot] == READY
+        return self.slotView(slot, self._lengths[slot])
+
+    def release(self, slot):
+        """Give a slot back to the writer."""
+        self._states[slot] = FREE
+
+
+class SharedConnection(object):
+    """One end of a SharedPipe. Writes go to one ring, reads come from the
+    other one.
+    """
+    def __init__(self, outgoing, incoming):
+        self.outgoing = outgoing
+        self.incoming = incoming
+
+    def send(self, messageclient, reciever, data, kind=0):
+        """Write data to shared memory and tell the reciever through the
+        message client. kind is passed on in the BufferReadyRequest, so that
+        the reciever knows what the data is.
+
+        Returns False if the data couldn't be written, because it's too
+        large for a slot or the reciever hasn't released any slot yet.
+        The caller can try again later or send the data in smaller parts.
+        """
+        slot = self.outgoing.write(data)
+        if slot is None:
+            return False
+        messageclient.unicast(reciever,
+                              BufferReadyRequest(slot, len(data), kind))
+        return True
+
+    def read(self, request):
+        """Return a memoryview of the data announced by a BufferReadyRequest.
+        Call release() as soon as the data has been used.
+        """
+        return self.incoming.read(request.slot)
+
+    def release(self, request):
+        self.incoming.release(request.slot)
+
+
+def SharedPipe(slots=4, slot_size=1 << 20):
+    """Create two connected SharedConnections, similar to
+    multiprocessing.Pipe. Each direction gets slots * slot_size bytes of
+    shared memory.
+    """
+    a_to_b = SharedRing(slots, slot_size)
+    b_to_a = SharedRing(slots, slot_size)
+    return SharedConnection(a_to_b, b_to_a), SharedConnection(b_to_a, a_to_b)
@@ -0,0 +1,138 @@
+from panity.behaviour import Behaviour, BehaviourScheduler
+from panity import behaviour as behaviour_module
+
+
+class FakeGameObject(object):
+    """Just enough of a GameObject for components. The real one needs
+    Panda3D.
+    """
+    def __init__(self):
+        self.components = {}
+
+
+calls = []
+
+class Logger(Behaviour):
+    def awake(self):
+        calls.append(("awake", self.name))
+    def start(self):
+        calls.append(("start", self.name))
+    def update(self):
+        calls.append(("update", self.name))
+    def lateUpdate(self):
+        calls.append(("lateUpdate", self.name))
+
+class EarlyLogger(Logger):
+    execution_order = -10
+
+class UpdateOnly(Behaviour):
+    def update(self):
+        calls.append(("update", self.name))
+
+class Physics(Behaviour):
+    def fixedUpdate(self):
+        calls.append(("fixedUpdate", self.name))
+    def update(self):
+        calls.append(("update", self.name))
+
+class Broken(Behaviour):
+    def update(self):
+        raise RuntimeError("this is expected to be printed")
+
+
+def make(cls, name):
+    behaviour = cls(FakeGameObject())
+    behaviour.name = name
+    return behaviour
+
+
+def checkPhases():
+    scheduler = behaviour_module.scheduler = BehaviourScheduler()
+    a = make(Logger, "a")
+    b = make(EarlyLogger, "b")
+    del calls[:]
+    scheduler.frame(0.016)
+    # awake and start once, then the phases by execution order
+    assert calls == [("awake", "b"), ("awake", "a"),
+                     ("start", "b"), ("start", "a"),
+                     ("update", "b"), ("update", "a"),
+                     ("lateUpdate", "b"), ("lateUpdate", "a")]
+    del calls[:]
+    scheduler.frame(0.016)
+    assert calls == [("update", "b"), ("update", "a"),
+                     ("lateUpdate", "b"), ("lateUpdate", "a")]
+    assert scheduler.delta_time == 0.016
+
+    # destroyed behaviours aren't called any more
+    a.destroy()
+    del calls[:]
+    scheduler.frame(0.016)
+    assert calls == [("update", "b"), ("lateUpdate", "b")]
+
+
+def checkSkipping():
+    scheduler = behaviour_module.scheduler = BehaviourScheduler()
+    assert scheduler.getHooks(UpdateOnly) == ("update",)
+    assert scheduler.getHooks(Behaviour) == ()
+    for i in range(100):
+        make(UpdateOnly, str(i))
+        make(Behaviour, "nothing %d" % i)
+    scheduler.frame(0.016)
+    # behaviours without hooks aren't in any bucket
+    assert sum(len(b) for b in scheduler._sequences["update"]) == 100
+    assert scheduler._sequences["lateUpdate"] == []
+
+
+def checkErrors():
+    scheduler = behaviour_module.scheduler = BehaviourScheduler()
+    make(Broken, "broken")
+    make(UpdateOnly, "after broken")
+    del calls[:]
+    print "you should see a traceback of a RuntimeError now:"
+    scheduler.frame(0.016)
+    # an error in one behaviour doesn't stop the others
+    assert calls == [("update", "after broken")]
+    assert scheduler.stats["update"].count == 1
+    assert "update" in scheduler.dumpStats()
+
+
+def checkFixedSteps():
+    scheduler = behaviour_module.scheduler = BehaviourScheduler(
+                                fixed_timestep=0.25, max_fixed_steps=3)
+    make(Physics, "p")
+    del calls[:]
+    # not enough time for a step yet
+    assert scheduler.step(0.125) == 0
+    assert scheduler.alpha == 0.5
+    scheduler.frame(0.125)
+    assert calls == [("fixedUpdate", "p"), ("update", "p")]
+    assert scheduler.alpha == 0.0
+
+    # several steps in one long frame, fixed steps first
+    del calls[:]
+    scheduler.frame(0.5)
+    assert calls == [("fixedUpdate", "p"), ("fixedUpdate", "p"),
+                     ("update", "p")]
+    assert scheduler.throttle_count == 0
+
+    # a very long frame is limited, the rest is dropped
+    assert scheduler.step(2.125) == 3
+    assert scheduler.throttle_count == 1
+    assert scheduler.dropped_time == 1.25
+    assert scheduler.alpha == 0.5
+    assert scheduler.fixed_step_count == 6
+
+    for arguments in [(0, 5), (-0.02, 5), (0.02, 0), (0.02, -1)]:
+        try:
+            BehaviourScheduler(*arguments)
+        except ValueError:
+            pass
+        else:
+            assert False, "{} must fail".format(arguments)
+
+
+checkPhases()
+checkSkipping()
+checkFixedSteps()
+checkErrors()
+print "success"
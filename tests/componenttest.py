@@ -0,0 +1,87 @@
+import gc
+
+from panity import components
+from panity.component import Component
+from panity.object import Object, unregisterObject
+from panity.properties import *
+
+
+class FakeGameObject(object):
+    """Just enough of a GameObject for components. The real one needs
+    Panda3D.
+    """
+    def __init__(self):
+        self.components = {}
+
+
+class RigidBody(Component):
+    mass = FloatProperty(default=1.0)
+    drag = FloatProperty()
+
+class HeavyRigidBody(RigidBody):
+    mass = FloatProperty(default=100.0)
+    material = StringProperty("iron")
+
+
+def checkPropertyInfo():
+    # inherited properties are included, redefined ones keep their place
+    names = [info.name for info in HeavyRigidBody.getPropertyInfo()]
+    assert names == ["mass", "drag", "material"]
+    assert HeavyRigidBody.getClassSerializedProperties()["mass"] is \
+           HeavyRigidBody.mass
+    assert HeavyRigidBody.getXMLTag() == "heavy_rigid_body"
+    info = HeavyRigidBody.getPropertyInfoByTag("material")
+    assert info.property is HeavyRigidBody.material
+    assert HeavyRigidBody.getPropertyInfoByTag("unknown") is None
+    # built once per class
+    assert RigidBody.getPropertyInfo() is RigidBody.getPropertyInfo()
+
+    body = HeavyRigidBody(FakeGameObject())
+    body.drag = 0.5
+    assert body.getSerializedProperties() == {"mass": 100.0, "drag": 0.5,
+                                              "material": "iron"}
+
+
+def checkRegistry():
+    cls = components.getComponentClass("DummyComponent")
+    assert cls.__name__ == "DummyComponent"
+    # xml tag and module name lead to the same class
+    assert components.getComponentClass("dummy_component") is cls
+    assert components.getComponentClass("dummycomponent") is cls
+    assert components.isComponentName("mesh")
+    assert not components.isComponentName("warp_drive")
+    try:
+        components.getComponentClass("WarpDrive")
+    except ImportError:
+        pass
+    else:
+        assert False, "unknown components must fail"
+
+
+def checkFindObjects():
+    light = RigidBody(FakeGameObject())
+    heavy = HeavyRigidBody(FakeGameObject())
+    # subclasses are found through their base classes
+    assert set(Object.findObjectsOfType(RigidBody)) >= set([light, heavy])
+    assert heavy in Object.findObjectsOfType(HeavyRigidBody)
+    assert light not in Object.findObjectsOfType(HeavyRigidBody)
+    assert isinstance(Object.findObjectOfType(HeavyRigidBody), HeavyRigidBody)
+
+    # destroyed and collected objects are gone
+    unregisterObject(heavy)
+    assert heavy not in Object.findObjectsOfType(RigidBody)
+    # the game object and its components reference each other
+    del light
+    gc.collect()
+    assert not [b for b in Object.findObjectsOfType(RigidBody)
+                if type(b) is RigidBody]
+    class Unused(Component):
+        pass
+    assert Object.findObjectsOfType(Unused) == []
+    assert Object.findObjectOfType(Unused) is None
+
+
+checkPropertyInfo()
+checkRegistry()
+checkFindObjects()
+print "success"
@@ -0,0 +1,157 @@
+from panity.gameobject import GameObject
+from panity.components import transform as transform_module
+from panity.components.transform import Transform
+
+
+def checkFind():
+    house = GameObject("house")
+    door = GameObject("door")
+    door.transform.parent = house.transform
+    handle = GameObject("handle")
+    handle.transform.parent = door.transform
+
+    assert GameObject.find("house/door/handle") is handle
+    assert GameObject.find("/house/door") is door
+    assert GameObject.find("door/handle") is handle
+    assert GameObject.find("/door") is None
+    assert GameObject.find("house/window") is None
+    assert house.transform.find("door/handle") is handle.transform
+
+    # renaming and reparenting keep the index up to date
+    door.name = "gate"
+    assert GameObject.find("house/door") is None
+    assert GameObject.find("house/gate/handle") is handle
+    handle.transform.parent = house.transform
+    assert GameObject.find("house/handle") is handle
+    assert GameObject.find("house/gate/handle") is None
+    assert handle in GameObject.findWithName("handle")
+
+    house.destroy()
+    assert GameObject.find("/house") is None
+    # descendants are gone, too
+    assert GameObject.findWithName("gate") == []
+    assert handle not in GameObject.findWithName("handle")
+    assert door.transform._indexed_parent is None
+
+
+def checkTags():
+    player = GameObject("player", tag="Player")
+    enemies = [GameObject("enemy", tag="Enemy") for _ in range(3)]
+    assert GameObject.findWithTag("Player") is player
+    assert set(GameObject.findGameObjectsWithTag("Enemy")) == set(enemies)
+    enemies[0].tag = "Friend"
+    assert enemies[0] not in GameObject.findGameObjectsWithTag("Enemy")
+    enemies[1].destroy()
+    assert GameObject.findGameObjectsWithTag("Enemy") == [enemies[2]]
+    # with their parent
+    enemies[2].transform.parent = player.transform
+    player.destroy()
+    assert GameObject.findGameObjectsWithTag("Enemy") == []
+    assert GameObject.findWithTag("Player") is None
+    assert GameObject.findWithTag("Nobody") is None
+
+
+def checkWorldTransforms():
+    root = GameObject("root")
+    arm = GameObject("arm")
+    arm.transform.parent = root.transform
+    hand = GameObject("hand")
+    hand.transform.parent = arm.transform
+    arm.transform.local_position = (1, 0, 0)
+    hand.transform.local_position = (0, 2, 0)
+    assert hand.transform.root is root.transform
+    assert hand.transform.position == (1, 2, 0)
+
+    # moving an ancestor moves the cached children, too
+    arm.transform.local_position = (5, 0, 0)
+    assert hand.transform.position == (5, 2, 0)
+    arm.transform.position = (0, 0, 3)
+    assert hand.transform.position == (0, 2, 3)
+    assert arm.transform.local_position == (0, 0, 3)
+
+    # and so does reparenting
+    other = GameObject("other root")
+    other.transform.local_position = (10, 0, 0)
+    arm.transform.parent = other.transform
+    assert hand.transform.root is other.transform
+    other_node = other.transform.node
+    assert hand.transform.position == hand.transform.node.getPos(other_node)
+
+    # changing the node directly requires invalidate()
+    arm.transform.node.setPos(1, 1, 1)
+    arm.transform.invalidate()
+    assert hand.transform.position == hand.transform.node.getPos(other_node)
+
+
+def checkVectorProperties():
+    transform = GameObject("vectors").transform
+    prop = Transform.local_position
+    transform.local_position = prop.fromXML("1 2 3")
+    assert transform.local_position == (1, 2, 3)
+    assert prop.fromXML(prop.toXML(transform.local_position)) == (1, 2, 3)
+    try:
+        prop.fromXML("1 2")
+    except ValueError:
+        pass
+    else:
+        assert False, "a vector with too few components must fail"
+
+    # other sequences are copied into the node
+    position = [4.0, 5.0, 6.0]
+    transform.local_position = position
+    position[0] = 0.0
+    assert transform.local_position == (4, 5, 6)
+    if transform_module.numpy is not None:
+        transform.local_position = transform_module.numpy.array([7, 8, 9.0])
+        assert transform.local_position == (7, 8, 9)
+
+    # the node stores single precision floats, assigning 0.1 again is no
+    # change anyway
+    changes = []
+    prop.addListener(transform, changes.append)
+    transform.local_position = (0.1, 0.2, 0.3)
+    transform.local_position = [0.1, 0.2, 0.3]
+    assert changes == [(0.1, 0.2, 0.3)]
+
+
+def checkBulkPositions():
+    root = GameObject("root")
+    transforms = []
+    for i in range(10):
+        game_object = GameObject("object %d" % i)
+        game_object.transform.parent = root.transform
+        transforms.append(game_object.transform)
+    changes = []
+    Transform.local_position.addListener(transforms[3], changes.append)
+
+    positions = transform_module.numpy.arange(30.0).reshape(10, 3)
+    Transform.setLocalPositions(transforms, positions)
+    assert (Transform.getLocalPositions(transforms) == positions).all()
+    assert transforms[3].position == (9, 10, 11)
+    # one notification per transform
+    assert changes == [(9.0, 10.0, 11.0)]
+    # only for transforms that moved
+    positions[3] += 1
+    Transform.setLocalPositions(transforms, positions)
+    Transform.setLocalPositions(transforms, positions)
+    assert changes == [(9.0, 10.0, 11.0), (10.0, 11.0, 12.0)]
+    # compared in single precision, like the nodes store them
+    positions[3] = 0.1
+    Transform.setLocalPositions(transforms, positions)
+    Transform.setLocalPositions(transforms, positions)
+    assert len(changes) == 3
+    try:
+        Transform.setLocalPositions(transforms, positions[:5])
+    except ValueError:
+        pass
+    else:
+        assert False, "positions of the wrong shape must fail"
+
+
+checkFind()
+checkTags()
+checkWorldTransforms()
+checkVectorProperties()
+if transform_module.numpy is not None:
+    checkBulkPositions()
+print "success"
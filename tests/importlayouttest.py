@@ -0,0 +1,103 @@
+"""The editor runs with the package directory itself on sys.path (see run.py),
+so its modules are imported as top-level modules, e.g. panda3dinstance,
+while components import panity.*. A module with global state loaded both
+ways exists twice, with two separate states. App modules must therefore
+import those modules as panity.* as well.
+
+Parts that need Panda3D are skipped without it.
+"""
+import os
+import sys
+
+from panity import components
+from panity import behaviour
+from panity.object import Object
+from panity.properties import StringProperty
+
+# run.py's layout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules with global state, they must only be loaded as panity.*
+STATEFUL_MODULES = ["behaviour", "component", "components", "gameobject",
+                    "object", "properties"]
+
+
+class FakeGameObject(object):
+    """Just enough of a GameObject for components. The real one needs
+    Panda3D.
+    """
+    def __init__(self):
+        self.components = {}
+
+
+def importApp(name):
+    """Import an app module like run.py does and check that it didn't load
+    a second copy of a module with global state. Returns None if
+    dependencies of the module are missing.
+    """
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    for stateful in STATEFUL_MODULES:
+        assert stateful not in sys.modules, \
+            "{} loaded a second {} module".format(name, stateful)
+    return module
+
+
+def checkScheduler():
+    instance = importApp("panda3dinstance")
+    if instance is not None:
+        # the one Panda3dInstance attaches to the task manager
+        assert instance.scheduler is behaviour.scheduler
+    camera = components.getComponentClass("camera")(FakeGameObject())
+    assert camera in behaviour.scheduler._pending
+
+
+def checkRegistry():
+    importApp("xmlvalidator")
+    if importApp("xmlparser") is None:
+        return
+    from panity.gameobject import GameObject
+    game_object = GameObject("registered")
+    cls = components.getComponentClass("dummy_component")
+    component = game_object.addComponent("DummyComponent")
+    assert component in Object.findObjectsOfType(cls)
+    game_object.destroy()
+    assert component not in Object.findObjectsOfType(cls)
+
+
+class Model(object):
+    path = StringProperty()
+
+
+class Rename(object):
+    """Step for the command history."""
+    def __init__(self, model):
+        self.model = model
+    def do(self):
+        self.model.path = "a"
+        self.model.path = "b"
+    def undo(self):
+        self.model.path = "c"
+        self.model.path = "d"
+
+
+def checkBatch():
+    commandhistory = importApp("commandhistory")
+    importApp("xmlparser")
+    model = Model()
+    paths = []
+    Model.path.addListener(model, paths.append)
+    history = commandhistory.CommandHistory()
+    history.undoable.append(Rename(model))
+    # listeners of panity.properties are batched by the history
+    history.undo()
+    history.redo()
+    assert paths == ["d", "b"]
+
+
+checkScheduler()
+checkRegistry()
+checkBatch()
+print "success"
@@ -0,0 +1,105 @@
+# Python 3 only. Run with the panity directory itself on the path, since
+# messageasync imports messagecenter as top level module.
+import asyncio
+from multiprocessing import Pipe
+
+from messagecenter import *
+from messageasync import AsyncMessageClient, AsyncMessageServer
+
+
+def echo(client):
+    """Reply to every request with its own payload."""
+    def listener(message):
+        if message.correlation is not None and not message.reply:
+            client.reply(message, message.payload)
+    client.addListener(listener)
+
+
+async def checkRequests():
+    loop = asyncio.get_event_loop()
+    server = AsyncMessageServer(MessageServer())
+    clients = {}
+    for name in ("real1", "real2"):
+        server_end, client_end = Pipe()
+        server.connectPipe(name, server_end)
+        clients[name] = AsyncMessageClient(MessageClient(client_end))
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("fake", fake_server)
+    caller = AsyncMessageClient(MessageClient(fake_pipe))
+    for name in ("real1", "real2"):
+        echo(clients[name].client)
+
+    # many requests in flight at once, replies go to the right caller
+    replies = await asyncio.gather(*[
+        caller.request(name, FocusWindowRequest(i), timeout=2)
+        for i in range(50) for name in ("real1", "real2")])
+    assert [p.window_id for p in replies] == [i for i in range(50)
+                                              for _ in range(2)]
+
+    # the other direction, to a fake pipe
+    echo(caller.client)
+    reply = await clients["real1"].request("fake", PingRequest(), timeout=2)
+    assert reply.req_spec == PING
+
+    # nobody answers
+    silent_server, silent_pipe = Pipe()
+    server.connectPipe("silent", silent_server)
+    silent = AsyncMessageClient(MessageClient(silent_pipe))
+    try:
+        await caller.request("silent", AddGameObjectRequest(1), timeout=0.05)
+    except asyncio.TimeoutError:
+        pass
+    else:
+        assert False, "request must time out"
+
+    assert not caller._futures
+
+    for client in clients.values():
+        client.close()
+    silent.close()
+    caller.close()
+    server.close()
+
+
+async def checkIteration():
+    server = AsyncMessageServer(MessageServer())
+    server_end, client_end = Pipe()
+    server.connectPipe("real", server_end)
+    real = AsyncMessageClient(MessageClient(client_end))
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("fake", fake_server)
+    fake = AsyncMessageClient(MessageClient(fake_pipe))
+
+    async def collect(count):
+        recieved = []
+        async for message in real.messages(UI, FOCUS_WINDOW):
+            recieved.append(message.payload.window_id)
+            if len(recieved) == count:
+                return recieved
+    task = asyncio.ensure_future(collect(3))
+    await asyncio.sleep(0)
+    for i in range(3):
+        fake.send("real", ResizeWindowRequest(i, 1, 1))
+        fake.send("real", FocusWindowRequest(i))
+    assert await asyncio.wait_for(task, 2) == [0, 1, 2]
+    # the iterator has unsubscribed
+    assert not real._subscriptions
+
+    # a closed pipe is detached
+    real.close()
+    client_end.close()
+    for _ in range(100):
+        if "real" not in server.server.pipes:
+            break
+        await asyncio.sleep(0.01)
+    assert "real" not in server.server.pipes
+    fake.close()
+    server.close()
+
+
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+loop.run_until_complete(checkRequests())
+loop.run_until_complete(checkIteration())
+loop.close()
+print("success")
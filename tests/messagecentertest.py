@@ -0,0 +1,451 @@
+import time
+from multiprocessing import Pipe
+
+from panity.messagecenter import *
+from panity.messagecenter import _Writer
+from panity.messagestats import MessageStats
+
+
+def waitFor(condition, timeout=2.0):
+    """Poll condition until it returns True or the timeout expires."""
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def detachWriter(server, name):
+    """Detach a real pipe and wait for its writer thread to end, so that no
+    writer is left running when the interpreter shuts down.
+    """
+    writer = server._outboxes[name].writer
+    server.detachPipe(name)
+    writer._thread.join()
+
+
+def checkPolling():
+    server = MessageServer()
+    a_server, a_pipe = FakePipe()
+    b_server, b_pipe = FakePipe()
+    server.connectPipe("a", a_server)
+    server.connectPipe("b", b_server)
+    a = MessageClient(a_pipe)
+    b = MessageClient(b_pipe)
+    recieved = []
+    b.addListener(recieved.append)
+
+    a.unicast("b", ResizeWindowRequest(1, 200, 100))
+    a.others(FocusWindowRequest(1))
+    server.process()
+    b.process()
+    assert len(recieved) == 2
+    assert recieved[0].payload.width == 200
+    assert recieved[1].payload.req_spec == FOCUS_WINDOW
+
+
+def checkDispatch():
+    server = MessageServer()
+    a_server, a_pipe = FakePipe()
+    b_server, b_pipe = FakePipe()
+    server.connectPipe("a", a_server)
+    server.connectPipe("b", b_server)
+    a = MessageClient(a_pipe)
+    b = MessageClient(b_pipe)
+    everything, ui, resizes = [], [], []
+    b.addListener(everything.append)
+    b.addListener(ui.append, UI)
+    b.addListener(resizes.append, UI, RESIZE_WINDOW)
+    # registering twice is ignored
+    b.addListener(resizes.append, UI, RESIZE_WINDOW)
+
+    a.others(ResizeWindowRequest(1, 200, 100))
+    a.others(FocusWindowRequest(1))
+    a.others(AddGameObjectRequest(1))
+    server.process()
+    b.process()
+    assert len(everything) == 3
+    assert len(ui) == 2
+    assert len(resizes) == 1 and resizes[0].payload.width == 200
+
+    # the dispatch table follows removals
+    b.removeListener(resizes.append, UI, RESIZE_WINDOW)
+    a.others(ResizeWindowRequest(1, 300, 100))
+    server.process()
+    b.process()
+    assert len(resizes) == 1 and len(ui) == 3
+    try:
+        b.removeListener(resizes.append, UI, RESIZE_WINDOW)
+    except ValueError:
+        pass
+    else:
+        assert False, "removing an unknown listener must fail"
+
+
+def checkTimeBudget():
+    server = MessageServer()
+    a_server, a_pipe = FakePipe()
+    b_server, b_pipe = FakePipe()
+    server.connectPipe("a", a_server)
+    server.connectPipe("b", b_server)
+    a = MessageClient(a_pipe)
+    b = MessageClient(b_pipe)
+    recieved = []
+    def slowListener(message):
+        recieved.append(message)
+        time.sleep(0.002)
+    b.addListener(slowListener)
+
+    for i in range(20):
+        a.others(AddGameObjectRequest(i))
+    server.process()
+    b.process(max_ms=5)
+    # stopped early, the rest waits for the next call
+    assert 0 < len(recieved) < 20
+    assert b.pending == 20 - len(recieved)
+    while b.pending:
+        b.process(max_ms=5)
+    assert [m.payload.go_id for m in recieved] == range(20)
+
+    # a listener that raises doesn't lose the messages after its own
+    def brokenListener(message):
+        if message.payload.go_id == 2:
+            raise RuntimeError("broken listener")
+    b.removeListener(slowListener)
+    b.addListener(brokenListener)
+    b.addListener(recieved.append)
+    del recieved[:]
+    for i in range(5):
+        a.others(AddGameObjectRequest(i))
+    server.process()
+    try:
+        b.process()
+    except RuntimeError:
+        pass
+    else:
+        assert False, "the listener's error must not be swallowed"
+    assert b.pending == 2
+    # positional arguments, e.g. a task, aren't a time budget
+    b.process(object())
+    assert [m.payload.go_id for m in recieved] == [0, 1, 3, 4]
+
+
+def checkEventDriven():
+    server = MessageServer()
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    real = MessageClient(real_pipe)
+    fake = MessageClient(fake_pipe)
+    # count how often the fake side gets notified
+    wakeups = []
+    fake_pipe.notify = wakeups.append
+    recieved = []
+    fake.addListener(recieved.append)
+    real.addListener(recieved.append)
+
+    server.start()
+    try:
+        real.unicast("fake", FocusWindowRequest(1))
+        real.flush()
+        assert waitFor(lambda: wakeups)
+        fake.process()
+        assert recieved[0].payload.window_id == 1
+
+        fake.unicast("real", FocusWindowRequest(2))
+        assert waitFor(lambda: real.pipe.poll())
+        real.process()
+        assert recieved[1].payload.window_id == 2
+
+        # broken messages and frames are printed, the server keeps running
+        print "you should see two tracebacks now:"
+        real.unicast("nobody", FocusWindowRequest(0))
+        real.unicast("fake", FocusWindowRequest(3))
+        real.flush()
+        assert waitFor(lambda: len(wakeups) > 1)
+        real_pipe.send_bytes(b"?")
+        fake.unicast("real", FocusWindowRequest(4))
+        assert waitFor(lambda: real.pipe.poll())
+        fake.process()
+        real.process()
+        assert [m.payload.window_id for m in recieved] == [1, 2, 3, 4]
+
+        # pipes can be connected while the server is running
+        late_server, late_pipe = FakePipe()
+        server.connectPipe("late", late_server)
+        MessageClient(late_pipe).unicast("real", FocusWindowRequest(5))
+        assert waitFor(lambda: real.pipe.poll())
+        real.process()
+        assert recieved[4].payload.window_id == 5
+    finally:
+        server.stop()
+        detachWriter(server, "real")
+
+
+def checkBatching():
+    server = MessageServer()
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    real = MessageClient(real_pipe, max_count=3, max_delay=60)
+    fake = MessageClient(fake_pipe)
+
+    # nothing is sent until the count threshold is reached
+    real.unicast("fake", FocusWindowRequest(1))
+    real.unicast("fake", FocusWindowRequest(2))
+    assert not real_server.poll()
+    real.unicast("fake", FocusWindowRequest(3))
+    assert real_server.poll()
+    # the server gets all three in one frame and forwards them unread
+    frame = recvFrame(real_server)
+    assert [m.payload.window_id for m in frame] == [1, 2, 3]
+
+    # many messages through the server arrive as one frame
+    for i in range(100):
+        fake.unicast("real", AddGameObjectRequest(i))
+    server.process()
+    frame = real_pipe.recv_bytes()
+    assert not real_pipe.poll()
+    messages = decodeFrame(frame)
+    assert len(messages) == 100
+    assert messages[99].payload.go_id == 99
+    assert messages[0].recievers == "real"
+    detachWriter(server, "real")
+
+
+class RenameRequest(CommandRequest):
+    req_spec = 100
+    def __init__(self, go_id, name):
+        self.go_id = go_id
+        self.name = name
+
+class UnregisteredRequest(UIRequest):
+    req_spec = 101
+    def __init__(self, anything):
+        self.anything = anything
+
+registerRequest(RenameRequest, [("go_id", "q"), ("name", "s")])
+
+
+def checkEncoding():
+    def roundtrip(payload):
+        return decodePayload(encodePayload(payload))
+
+    p = roundtrip(ResizeWindowRequest(2, 640, 480))
+    assert type(p) is ResizeWindowRequest
+    assert (p.window_id, p.width, p.height) == (2, 640, 480)
+    # fixed layout: header and three ints, nothing else
+    assert len(encodePayload(p)) == 3 + 12
+
+    p = roundtrip(RenameRequest(7, "house"))
+    assert (p.go_id, p.name) == (7, "house")
+
+    # values that don't fit the layout are pickled
+    p = roundtrip(OpenWindowRequest(1, handle=None))
+    assert p.handle is None and p.width == 500
+    p = roundtrip(AddGameObjectRequest("a name"))
+    assert p.go_id == "a name"
+    p = roundtrip(UnregisteredRequest([1, 2]))
+    assert p.anything == [1, 2]
+
+
+def checkCoalescing():
+    server = MessageServer()
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    real = MessageClient(real_pipe, max_delay=60)
+    fake = MessageClient(fake_pipe)
+    recieved = []
+    real.addListener(recieved.append)
+    fake.addListener(recieved.append)
+
+    # the server forwards only the latest resize of each window
+    for width in range(100, 200):
+        fake.unicast("real", ResizeWindowRequest(1, width, 50))
+        fake.unicast("real", ResizeWindowRequest(2, width, 50))
+    fake.unicast("real", FocusWindowRequest(1))
+    fake.unicast("real", FocusWindowRequest(1))
+    server.process()
+    messages = decodeFrame(real_pipe.recv_bytes())
+    assert [(m.payload.window_id, m.payload.width) for m in messages[:2]] ==\
+           [(1, 199), (2, 199)]
+    # messages without key are never dropped
+    assert len(messages) == 4
+
+    # same on the client's queue
+    for width in range(100, 200):
+        real.unicast("fake", ResizeWindowRequest(1, width, 50))
+    real.flush()
+    server.process()
+    fake.process()
+    assert len(recieved) == 1 and recieved[0].payload.width == 199
+
+    # and when several frames are waiting at the reciever
+    del recieved[:]
+    for width in range(100, 110):
+        fake.unicast("real", ResizeWindowRequest(1, width, 50))
+        server.process()
+    server.drain()
+    real.process()
+    assert len(recieved) == 1 and recieved[0].payload.width == 109
+    detachWriter(server, "real")
+
+
+def checkGroups():
+    server = MessageServer()
+    clients = {}
+    for name in ("a", "b", "c"):
+        server_end, client_end = FakePipe()
+        server.connectPipe(name, server_end)
+        clients[name] = MessageClient(client_end)
+    recieved = dict((name, []) for name in clients)
+    for name, client in clients.items():
+        client.addListener(recieved[name].append)
+    server.addToGroup("viewports", "b")
+    server.addToGroup("viewports", "c")
+
+    clients["a"].unicast("viewports", FocusWindowRequest(1))
+    clients["a"].others(FocusWindowRequest(2))
+    # listing a client directly and through a group delivers only once
+    clients["a"].multicast(["b", "viewports"], FocusWindowRequest(3))
+    server.process()
+    for client in clients.values():
+        client.process()
+    assert len(recieved["a"]) == 0
+    assert [m.payload.window_id for m in recieved["b"]] == [1, 2, 3]
+    assert [m.payload.window_id for m in recieved["c"]] == [1, 2, 3]
+
+    # detached clients are removed from routes and groups
+    server.detachPipe("c")
+    clients["a"].unicast("viewports", FocusWindowRequest(4))
+    server.process()
+    clients["b"].process()
+    assert recieved["b"][-1].payload.window_id == 4
+    assert server.groups["viewports"] == set(["b"])
+
+
+def checkBackpressure():
+    # nobody reads from the real pipe
+    server = MessageServer(queue_limit=10)
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    fake = MessageClient(fake_pipe)
+
+    # enough data to fill up the OS pipe buffer, then some more
+    start = time.time()
+    for i in range(200):
+        fake.unicast("real", UnregisteredRequest("x" * 10000))
+        fake.unicast("real", AddGameObjectRequest(i))
+        server.process()
+    # the server never had to wait for the reciever
+    assert time.time() - start < 1.0
+    stats = server.getQueueStats()["real"]
+    # UI requests have been dropped, commands kept beyond the limit
+    assert stats["dropped"] > 0
+    assert stats["spilled"] > 0
+    assert stats["depth"] > 10
+    assert stats["blocked"] == 0
+
+    # once the reciever reads again, every command arrives
+    go_ids = []
+    while len(go_ids) < 200:
+        for message in recvFrame(real_pipe):
+            if message.payload.req_type == COMMAND:
+                go_ids.append(message.payload.go_id)
+    assert go_ids == range(200)
+    detachWriter(server, "real")
+
+
+def checkBlocking():
+    # nobody reads from the real pipe, and commands must not be dropped
+    server = MessageServer(queue_limit=10, policies={COMMAND: BLOCK})
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    fake = MessageClient(fake_pipe)
+
+    start = time.time()
+    for i in range(200):
+        fake.unicast("real", UnregisteredRequest("x" * 10000))
+        server.process()
+    for i in range(50):
+        fake.unicast("real", AddGameObjectRequest(i))
+        server.process()
+    # the server never waited, it stopped reading from the sender instead
+    assert time.time() - start < 1.0
+    stats = server.getQueueStats()["real"]
+    assert stats["blocked"] > 0
+    assert stats["depth"] < 20
+    assert fake_server.poll()
+
+    # once the reciever reads again, the sender is resumed
+    go_ids = []
+    while len(go_ids) < 50:
+        server.process()
+        while real_pipe.poll(0.01):
+            for message in recvFrame(real_pipe):
+                if message.payload.req_type == COMMAND:
+                    go_ids.append(message.payload.go_id)
+    assert go_ids == range(50)
+    assert server.drain(1.0)
+    detachWriter(server, "real")
+
+    # messages for a reciever that is gone count as dropped, not as sent
+    real_server, real_pipe = Pipe()
+    writer = _Writer("real", real_server, 10, {}, MessageServer())
+    real_pipe.close()
+    writer.put([Message(ALL, AddGameObjectRequest(1))])
+    # the writer thread ends after the failed send
+    writer._thread.join()
+    stats = writer.stats()
+    assert stats["sent"] == 0
+    assert stats["dropped"] == 1
+
+
+def checkStats():
+    server = MessageServer()
+    server.stats = MessageStats()
+    real_server, real_pipe = Pipe()
+    fake_server, fake_pipe = FakePipe()
+    server.connectPipe("real", real_server)
+    server.connectPipe("fake", fake_server)
+    real = MessageClient(real_pipe)
+    real.stats = MessageStats()
+    fake = MessageClient(fake_pipe)
+    fake.stats = MessageStats()
+
+    for i in range(10):
+        fake.unicast("real", ResizeWindowRequest(i, 10, 10))
+    server.process()
+    server.drain()
+    real.process()
+    assert real.stats.counters["recieved", "UI/RESIZE_WINDOW"][0] == 10
+    assert real.stats.histograms["latency", "UI/RESIZE_WINDOW"].count == 10
+    assert fake.stats.counters["sent", "UI/RESIZE_WINDOW"][0] == 10
+    assert server.stats.counters["recieved from", "fake"][0] == 10
+    assert server.stats.counters["forwarded to", "real"][0] == 10
+    assert server.stats.histograms["queued for", "real"].count == 10
+    assert "forwarded to dispatched UI/RESIZE_WINDOW" in real.stats.dump()
+    detachWriter(server, "real")
+
+
+checkPolling()
+checkGroups()
+checkDispatch()
+checkTimeBudget()
+checkEventDriven()
+checkBatching()
+checkEncoding()
+checkCoalescing()
+checkBackpressure()
+checkBlocking()
+checkStats()
+print "success"
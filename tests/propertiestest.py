@@ -1,4 +1,8 @@
+import gc
+import weakref
+
 from panity.properties import *
+from panity import properties
 
 class C(object):
     f1 = FloatProperty()
@@ -50,7 +54,365 @@ def checkListeners():
     d.f1 = 4.0 # callback only spawns on change, but this is none
 
 
+def checkLayout():
+
+    class E(C):
+        i = IntegerProperty(default=3)
+
+    e = E()
+    assert e.i == 3
+    assert e.f2 == 1.0
+    e.f2 = 2.0
+    assert e.f2 == 2.0
+    assert C().f2 == 1.0
+    # subclasses append their properties to the slots of the base class
+    assert E.i.index > C.f2.index
+
+    class F(object):
+        s = StringProperty("x")
+
+    assert F().s == "x"
+
+    # F.s and C.f1 were both laid out at the first slot, G gets another one
+    # for one of them
+    class G(E, F):
+        pass
+
+    g = G()
+    assert (g.f1, g.f2, g.i, g.s) == (0.0, 1.0, 3, "x")
+    g.s = "y"
+    g.f1 = 5.0
+    assert (g.f1, g.s) == (5.0, "y")
+    assert G.s.slot(G) != G.f1.slot(G)
+    # the base classes are unaffected
+    f = F()
+    assert f.s == "x"
+    f.s = "z"
+    assert f.s == "z" and C().f1 == 0.0
+
+    class A(object):
+        a = FloatProperty(default=1.0)
+
+    class B(object):
+        b = FloatProperty(default=2.0)
+
+    A().a, B().b
+    class AB(A, B):
+        pass
+
+    class ABC(AB):
+        c = FloatProperty(default=3.0)
+
+    abc = ABC()
+    assert (abc.a, abc.b, abc.c) == (1.0, 2.0, 3.0)
+    abc.b = 4.0
+    assert (abc.a, abc.b, abc.c) == (1.0, 4.0, 3.0)
+    assert (AB().a, AB().b) == (1.0, 2.0)
+
+
+def checkCoercion():
+
+    class E(object):
+        f = FloatProperty(minimum=0.0, maximum=10.0)
+        i = IntegerProperty(maximum=5)
+        u = UnsignedIntegerProperty()
+        s = StringProperty()
+
+    e = E()
+    e.f = 20
+    assert e.f == 10.0 and type(e.f) is float
+    e.f = "-3"
+    assert e.f == 0.0
+    e.i = "7"
+    assert e.i == 5 and type(e.i) is int
+    # rejected, also under python -O
+    assert E.u.__set__(e, -1) is False
+    assert e.u == 0
+    e.s = 12
+    assert e.s == "12"
+    # changed settings take effect
+    E.f.maximum = 100.0
+    e.f = 20.0
+    assert e.f == 20.0
+
+    # subclasses with own checks still work
+    class EvenProperty(IntegerProperty):
+        def check(self, value):
+            IntegerProperty.check(self, value)
+            if value % 2:
+                raise ValueError("odd")
+    class F(object):
+        even = EvenProperty()
+    f = F()
+    f.even = 4
+    f.even = 3
+    assert f.even == 4
+
+
+def checkBatch():
+
+    c1 = C()
+    c2 = C()
+    calls = []
+    changesets = []
+    C.f1.addListener(c1, calls.append)
+    C.f1.addListener(c1, changesets.append, changeset=True)
+    C.f2.addListener(c2, changesets.append, changeset=True)
+
+    with batch():
+        c1.f1 = 1.0
+        c2.f2 = 5.0
+        with batch():
+            c1.f1 = 2.0
+        assert calls == []
+        c1.f1 = 3.0
+    # once per listener, with the final value
+    assert calls == [3.0]
+    assert changesets == [[(c1, C.f1, 3.0), (c2, C.f2, 5.0)]]
+
+    # outside of a batch changeset listeners get single changes
+    c2.f2 = 6.0
+    assert changesets[-1] == [(c2, C.f2, 6.0)]
+    C.f2.removeListener(c2, changesets.append)
+    c2.f2 = 7.0
+    assert len(changesets) == 2
+
+    # listeners of a failing block are called anyway, the values have
+    # changed. Their errors don't replace the original exception.
+    def brokenListener(value):
+        raise RuntimeError("this is expected to be printed")
+    C.f2.addListener(c1, brokenListener)
+    print "you should see a traceback of a RuntimeError now:"
+    try:
+        with batch():
+            c1.f1 = 4.0
+            c1.f2 = 4.0
+            raise KeyError("original")
+    except KeyError:
+        pass
+    else:
+        assert False, "the original exception must propagate"
+    assert calls == [3.0, 4.0]
+
+
+def checkWeakListeners():
+
+    class Watcher(object):
+        def __init__(self):
+            self.values = []
+        def changed(self, value):
+            self.values.append(value)
+
+    c = C()
+    watcher = Watcher()
+    C.f1.addListener(c, watcher.changed)
+    values = []
+    C.f1.addListener(c, lambda value: values.append(value))
+    c.f1 = 1.0
+    assert watcher.values == [1.0]
+    # listening doesn't keep the watcher alive and its listener goes away
+    # with it, lambdas stay
+    ref = weakref.ref(watcher)
+    del watcher
+    assert ref() is None
+    assert len(c._listeners[C.f1]) == 1
+    c.f1 = 2.0
+    assert values == [1.0, 2.0]
+
+    class D(C):
+        def __init__(self):
+            D.f1.addListener(self, self.changed)
+        def changed(self, value):
+            pass
+
+    # objects listening to themselves are freed without the cycle collector
+    gc.disable()
+    try:
+        d = D()
+        d.f1 = 1.0
+        ref = weakref.ref(d)
+        del d
+        assert ref() is None
+    finally:
+        gc.enable()
+
+
+def checkJournal():
+
+    c1 = C()
+    c2 = C()
+    start = journal.version
+    c1.f1 = 1.0
+    c2.f1 = 1.0
+    middle = journal.version
+    c1.f2 = 2.0
+    c1.f1 = 3.0
+    # unchanged values are no changes
+    c2.f1 = 1.0
+    assert list(journal.changesSince(start)) == [(c2, C.f1), (c1, C.f2),
+                                                 (c1, C.f1)]
+    assert list(journal.changesSince(middle)) == [(c1, C.f2), (c1, C.f1)]
+    assert list(journal.changesSince(journal.version)) == []
+    assert journal.getDirtyProperties(c1, middle) == set([C.f1, C.f2])
+    journal.markClean(c1)
+    assert list(journal.changesSince(start)) == [(c2, C.f1)]
+
+    # destroyed objects drop out, many changes don't pile up
+    for i in range(5000):
+        c2.f1 = float(i)
+        c2.f2 = float(i)
+    del c2
+    assert list(journal.changesSince(start)) == []
+    assert len(journal._log) < 10000
+
+
+def checkDecorator():
+
+    class D(object):
+        def __init__(self):
+            self.calls = 0
+            self._x = 0.0
+        @SerializedPropertyDecorator
+        def x(self):
+            return self._x
+        @x.setter
+        def x(self, x):
+            self.calls += 1
+            self._x = x
+
+    d = D()
+    seen = []
+    D.x.addListener(d, lambda value: seen.append(d._x))
+    start = journal.version
+    # unchanged values are no changes
+    d.x = 0.0
+    assert d.calls == 0 and seen == []
+    assert list(journal.changesSince(start)) == []
+    # listeners are called after the setter
+    d.x = 1.0
+    assert d.calls == 1 and seen == [1.0]
+    assert list(journal.changesSince(start)) == [(d, D.x)]
+
+
+def checkVectors():
+
+    class E(object):
+        position = Vec3Property()
+        rotation = QuatProperty()
+
+    e1 = E()
+    e2 = E()
+    position = e1.position
+    e1.position = (1, 2, 3)
+    # updated in place, the default is untouched
+    assert e1.position is position
+    assert tuple(e1.position) == (1.0, 2.0, 3.0)
+    assert tuple(e2.position) == (0.0, 0.0, 0.0)
+    E.position.setComponent(e1, 2, 5)
+    assert e1.position[2] == 5.0
+    assert E.position.__set__(e1, (1, 2)) is False
+    assert tuple(e2.rotation) == (1.0, 0.0, 0.0, 0.0)
+
+    # components are single precision, assigning 0.1 again is no change
+    changes = []
+    E.position.addListener(e2, lambda value: changes.append(tuple(value)))
+    e2.position = (0.1, 0.2, 0.3)
+    e2.position = [0.1, 0.2, 0.3]
+    E.position.setComponent(e2, 0, 0.1)
+    assert len(changes) == 1
+
+    xml = E.position.toXML(e1.position)
+    assert xml == "1 2 5"
+    e2.position = E.position.fromXML(xml)
+    assert e2.position == e1.position
+
+
+def checkColumnar():
+
+    @columnar
+    class Body(object):
+        mass = FloatProperty(minimum=0.0, default=1.0)
+        layer = IntegerProperty()
+        label = StringProperty("body")
+
+    bodies = [Body() for i in range(100)]
+    for i, body in enumerate(bodies):
+        body.mass = float(i)
+    assert bodies[5].mass == 5.0
+    assert bodies[5].label == "body"
+    bodies[5].label = "five"
+    assert bodies[5].label == "five" and bodies[6].label == "body"
+
+    heavy = Body.mass.filter(Body, lambda mass: mass > 90)
+    assert sorted(b.mass for b in heavy) == range(91, 100)
+
+    changed = []
+    Body.mass.addListener(bodies[0], changed.append)
+    # clipped to the minimum, listener gets the final value
+    Body.mass.setColumn(Body, Body.mass.column(Body) * 2 - 10)
+    assert bodies[0].mass == 0.0 and bodies[50].mass == 90.0
+    assert changed == []
+    Body.mass.setColumn(Body, 3.0)
+    assert changed == [3.0]
+    assert Body.layer.column(Body).sum() == 0
+
+    # rows of destroyed instances are reused
+    bodies[10].layer = 7
+    del bodies[:10]
+    assert len(Body.mass.column(Body)) == 90
+    assert Body.layer.column(Body).sum() == 7
+    assert bodies[0].layer == 7
+
+    try:
+        Body.label.column(Body)
+    except TypeError:
+        pass
+    else:
+        assert False, "string properties don't have columns"
+
+
+def checkColumnarCycles():
+
+    @columnar
+    class Node(object):
+        value = IntegerProperty()
+
+    # instances in cycles are removed by the garbage collector, which may
+    # run in the middle of adding or removing a row
+    threshold = gc.get_threshold()
+    gc.set_threshold(5, 1, 1)
+    try:
+        nodes = []
+        for i in range(3000):
+            node = Node()
+            node.cycle = node
+            node.value = i
+            nodes.append(node)
+            if i % 3 == 0:
+                del nodes[len(nodes) // 2]
+    finally:
+        gc.set_threshold(*threshold)
+    gc.collect()
+    store = properties._getLayout(Node).store
+    assert store.count == len(nodes) == len(store.views)
+    assert all(view.row == row for row, view in enumerate(store.views))
+    assert None not in store.owners(range(store.count))
+    values = [node.value for node in nodes]
+    assert values == sorted(values) and len(set(values)) == len(values)
+
+
 
 checkAssignment()
 checkListeners()
+checkLayout()
+checkCoercion()
+checkBatch()
+checkWeakListeners()
+checkJournal()
+checkDecorator()
+if hasattr(properties, "Quat"):
+    checkVectors()
+if properties.numpy is not None:
+    checkColumnar()
+    checkColumnarCycles()
 print "success"
\ No newline at end of file
@@ -0,0 +1,53 @@
+from multiprocessing import Process, Pipe
+
+from panity.messagecenter import *
+from panity.sharedmemory import SharedPipe
+
+
+def echo(pipe, shared):
+    """Subprocess: send every recieved buffer back reversed."""
+    client = MessageClient(pipe)
+    while True:
+        for message in recvFrame(pipe):
+            p = message.payload
+            if p.kind == 0:
+                return
+            data = shared.read(p).tobytes()
+            shared.release(p)
+            shared.send(client, "gui", data[::-1], kind=p.kind)
+            client.flush()
+
+
+def checkRing():
+    a, b = SharedPipe(slots=2, slot_size=8)
+    assert a.outgoing.write(b"too large to fit") is None
+    s1 = a.outgoing.write(b"first")
+    s2 = a.outgoing.write(b"second")
+    # both slots are taken until the reader releases one
+    assert a.outgoing.write(b"third") is None
+    request = BufferReadyRequest(s1, 5)
+    assert b.read(request).tobytes() == b"first"
+    b.release(request)
+    assert a.outgoing.write(b"third") == s1
+
+
+def checkSubprocess():
+    gui_shared, panda_shared = SharedPipe(slots=4, slot_size=1024)
+    gui_pipe, panda_pipe = Pipe()
+    process = Process(target=echo, args=(panda_pipe, panda_shared))
+    process.start()
+    client = MessageClient(gui_pipe)
+    for i in range(10):
+        assert gui_shared.send(client, "panda", b"abc" * (i + 1), kind=1)
+        client.flush()
+        p = recvFrame(gui_pipe)[0].payload
+        assert gui_shared.read(p).tobytes() == b"cba" * (i + 1)
+        gui_shared.release(p)
+    client.unicast("panda", BufferReadyRequest(0, 0, kind=0))
+    client.flush()
+    process.join()
+
+
+checkRing()
+checkSubprocess()
+print "success"
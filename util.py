@@ -1,4 +1,5 @@
 import re
+import weakref
 
 _underscorer1 = re.compile('(.)([A-Z][a-z]+)')
 _underscorer2 = re.compile('([a-z0-9])([A-Z])')
@@ -19,4 +20,61 @@ def isNumber(num):
         float(num)
         return True
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+try:
+    from weakref import WeakMethod
+except ImportError:
+    class WeakMethod(weakref.ref):
+        """Weak reference to a bound method, like weakref.WeakMethod of
+        Python 3. A plain weak reference to a bound method dies right away,
+        because bound methods are created on every attribute access. This one
+        references the object and the function instead and is dead as soon
+        as either of them is.
+        """
+        __slots__ = ("_func_ref", "_meth_type", "_alive", "__weakref__")
+
+        def __new__(cls, meth, callback=None):
+            try:
+                obj = meth.__self__
+                func = meth.__func__
+            except AttributeError:
+                raise TypeError("argument should be a bound method, not "
+                                "{}".format(type(meth)))
+            def _cb(arg):
+                # the callback of the first reference to die is the only one
+                # passed on
+                self = self_wr()
+                if self is not None and self._alive:
+                    self._alive = False
+                    if callback is not None:
+                        callback(self)
+            self = weakref.ref.__new__(cls, obj, _cb)
+            self._func_ref = weakref.ref(func, _cb)
+            self._meth_type = type(meth)
+            self._alive = True
+            self_wr = weakref.ref(self)
+            return self
+
+        def __init__(self, meth, callback=None):
+            super(WeakMethod, self).__init__(meth.__self__, callback)
+
+        def __call__(self):
+            obj = super(WeakMethod, self).__call__()
+            func = self._func_ref()
+            if obj is None or func is None:
+                return None
+            return self._meth_type(func, obj)
+
+        def __eq__(self, other):
+            if isinstance(other, WeakMethod):
+                if not self._alive or not other._alive:
+                    return self is other
+                return (weakref.ref.__eq__(self, other) and
+                        self._func_ref == other._func_ref)
+            return False
+
+        def __ne__(self, other):
+            return not self == other
+
+        __hash__ = weakref.ref.__hash__
@@ -3,21 +3,14 @@ try:
 except ImportError:
     from xml.etree import ElementTree as etree
 
-import os.path
-import pkgutil
-
 from panda3d.core import VBase2, VBase3, VBase4
 
 from parserinterface import ParserInterface
 from xmlvalidator import validateScene
-from gameobject import GameObject
-from component import Component
-import components as components_package
-import util
-
-# Find out what components we have
-_pkgpath = os.path.dirname(components_package.__file__)
-COMPONENT_MODULES = [name for _, name, _ in pkgutil.iter_modules([_pkgpath])]
+from panity.gameobject import GameObject, UNTAGGED
+from panity.component import Component
+from panity.properties import batch, parseXMLValue
+from panity.components import COMPONENT_MODULES, getComponentClass
 
 # UTILITY STUFF
 
@@ -33,10 +26,12 @@ def prettifyXML(xml_code):
 # SCENE
 
 def getSceneFromXMLElement(element, root_name="scene", validate=True):
-    root = GameObject(str(root_name))
-    for xml_go in element:
-        go = getGameObjectFromXMLElement(xml_go)
-        go.transform.parent = root.transform
+    # listeners (e.g. loading models) are called once all values are set
+    with batch():
+        root = GameObject(str(root_name))
+        for xml_go in element:
+            go = getGameObjectFromXMLElement(xml_go)
+            go.transform.parent = root.transform
     return root
 
 def getSceneFromXMLFile(filename, validate=True):
@@ -60,7 +55,8 @@ def getXMLFromScene(scene):
 
 def getGameObjectFromXML(xml_code):
     xml_go = etree.fromstring(xml_code)
-    return getGameObjectFromXMLElement(xml_go)
+    with batch():
+        return getGameObjectFromXMLElement(xml_go)
 
 def getGameObjectFromXMLElement(element):
     # prefab means we should create an instance of a prefab and extend it
@@ -71,12 +67,15 @@ def getGameObjectFromXMLElement(element):
     else:
         # prefab attribute not set. Use a new game object
         go = GameObject(name)
+    tag = element.get("tag")
+    if tag is not None:
+        go.tag = tag
     for go_or_comp in element:
         # a game object can contain game objects and components
         if go_or_comp.tag == "gameobject":
             xml_go = go_or_comp
             child = getGameObjectFromXMLElement(xml_go)
-            child.parent = go
+            child.transform.parent = go.transform
         else: # must be a component otherwise
             getComponentFromXMLElement(go_or_comp, go)
     return go
@@ -88,6 +87,8 @@ def getGameObjectFromPrefabFileName(filename):
 def getXMLElementFromGameObject(game_object):
     xml = etree.Element("gameobject")
     xml.attrib["name"] = game_object.name
+    if game_object.tag != UNTAGGED:
+        xml.attrib["tag"] = game_object.tag
     for component in game_object.components.values():
         xml.append(getXMLElementFromComponent(component))
     for child in game_object:
@@ -102,41 +103,36 @@ def getXMLFromGameObject(game_object):
 # COMPONENT
 
 def getComponentFromXMLElement(element, game_object):
+    try:
+        cls = getComponentClass(element.tag)
+    except ImportError, e:
+        print "".join(["Importing component {} failed! ",
+                       "Skipping."]).format(element.tag)
+        return
     # does the GO already have such a component?
-    comp = game_object.getComponent(util.snakeToCamel(element.tag))
+    comp = game_object.getComponent(cls.__name__)
     if not comp:
         # if not, create it
-        try:
-            comp = game_object.addComponent(util.snakeToCamel(element.tag))
-        except ImportError, e:
-             print "".join(["Importing component {} failed! ",
-                           "Skipping."]).format(element.tag)
-             return
-
+        comp = game_object.addComponent(cls)
 
+    cls = type(comp)
     for option in element:
-        # check if it might be an array of numbers
         if option.text is None:
             continue
-        str_nums = option.text.split(" ")
-        try:
-            nums = map(float, str_nums)
-        except ValueError:
-            # couldn't convert strings to numbers. it must be a str
-            setattr(comp, option.tag, option.text)
+        info = cls.getPropertyInfoByTag(option.tag)
+        if info is not None:
+            # the property knows best how to read its value
+            setattr(comp, info.name, info.fromXML(option.text))
         else:
-            # conversion to a floats was successful, assign them as
-            # list of floats
-            setattr(comp, option.tag, nums)
+            # a list of numbers or a string
+            setattr(comp, option.tag, parseXMLValue(option.text))
 
 def getXMLElementFromComponent(component):
-    name = type(component).__name__
-    name = util.camelToSnake(name)
-    xml = etree.Element(name)
-    for p, v in type(component).getClassSerializedProperties().iteritems():
-        child = etree.Element(util.camelToSnake(p))
-        child.text =  v.toXML(v.getValue(component))
-        xml.append(child)
+    cls = type(component)
+    xml = etree.Element(cls.getXMLTag())
+    for info in cls.getPropertyInfo():
+        child = etree.SubElement(xml, info.tag)
+        child.text = info.toXML(info.property.getValue(component))
     return xml
 
 def getXMLFromComponent(component):
@@ -5,18 +5,13 @@ Whether a file is considered a scene or prefab depends on the root tag.
 Scenes should have 'scene' as root tag and prefabs 'gameobject'.
 """
 
-import os
 import sys
-import pkgutil
 try:
     from xml.etree import cElementTree as etree
 except ImportError:
     from xml.etree import ElementTree as etree
 
-import components as components_package
-# Find out what components we have
-_pkgpath = os.path.dirname(components_package.__file__)
-COMPONENT_MODULES = [name for _, name, _ in pkgutil.iter_modules([_pkgpath])]
+from panity.components import COMPONENT_MODULES, isComponentName
 
 # TODO: make this module use xml schema (XSD) through lxml
 
@@ -48,7 +43,8 @@ def validateGameObject(go):
 
 def validateComponent(comp):
     """comp should be an xml element (-tree) of type component."""
-    assert comp.tag in COMPONENT_MODULES
+    assert isComponentName(comp.tag), "unknown component '{}'".format(
+                                                                    comp.tag)
     # For further validation, use xml schema
 
 def validate(anything):